@@ -1,7 +1,15 @@
+import hashlib
 import streamlit as st
 import pandas as pd
-import io
-from processing import process_survey_data, generate_docx_dictionary
+from processing import read_merged_file, MERGED_FILE_TYPES, OUTPUT_FORMATS
+from pipeline import DatasetJob, DatasetResult, run_datasets, run_exports, build_export
+from result_cache import ResultCache, cache_key
+from linkage import link_waves
+from explorer import parse_list, parse_ranges, SHOW_OPTIONS
+from instrumentation import configure_logging
+
+# Stage timings go to the app's logs as JSON lines (level set by DATA_UNION_LOG_LEVEL)
+configure_logging()
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -43,7 +51,7 @@ st.markdown("""
 st.title("Qualtrics Data Merger 📊")
 st.markdown("""
 Refine and merge your Pre-Survey and Post-Survey Qualtrics datasets. 
-This tool combines **Values** and **Labels** into clean Excel files.
+This tool combines **Values** and **Labels** into clean Excel (or Parquet / Arrow / CSV) files.
 """)
 
 st.write("---")
@@ -71,10 +79,152 @@ with st.sidebar:
     st.header("3. Settings")
     pre_unique_id_col = st.text_input("Pre-Survey Unique ID Column", value="Q2", help="Exact column name containing the unique identifier in the Pre-Survey (e.g., 'Q2')")
     post_unique_id_col = st.text_input("Post-Survey Unique ID Column", value="Q2", help="Exact column name containing the unique identifier in the Post-Survey (e.g., 'Q2')")
+    output_format = st.selectbox(
+        "Merged Data Format",
+        options=list(OUTPUT_FORMATS),
+        format_func=lambda fmt: OUTPUT_FORMATS[fmt][0],
+        help="Excel is limited to 1,048,576 rows; Parquet and Arrow reload fastest in pandas/R."
+    )
+    output_name, output_ext, output_mime = OUTPUT_FORMATS[output_format]
+    trace_memory = st.checkbox(
+        "Measure memory per stage",
+        value=False,
+        help="Adds peak memory to the Performance Report. Tracing makes processing noticeably slower."
+    )
 
     st.markdown("---")
     process_btn = st.button("🚀 Process & Merge Data", type="primary")
 
+# --- Cached Results ---
+# Streamlit reruns this script on every widget interaction (including download clicks).
+# Merged datasets and their exports are kept in session state, keyed on a content hash
+# of the uploaded files plus the unique ID setting, so reruns reuse them. Behind that,
+# a disk cache shared by all sessions keeps them across sessions and restarts, so the
+# same exports uploaded by another colleague are not merged again.
+MAX_CACHED_DATASETS = 4
+
+@st.cache_resource
+def get_result_cache():
+    """Disk cache shared by every session of this server, or None if it cannot be created."""
+    try:
+        return ResultCache()
+    except OSError as e:
+        print(f"WARNING: Disk cache disabled: {e}")
+        return None
+
+def persist(result):
+    """Stores a merged result and its exports so far in the disk cache (best effort)."""
+    disk_cache = get_result_cache()
+    if disk_cache is None or result.cache_key is None:
+        return
+    try:
+        disk_cache.store(result.cache_key, result)
+    except OSError as e:
+        print(f"WARNING: Could not write to the disk cache: {e}")
+
+def load_datasets(jobs):
+    """
+    Returns {name: DatasetResult} for the jobs. Each content/ID combination is looked up
+    in session state, then in the disk cache; only the ones found in neither are merged,
+    concurrently on the pipeline's worker pool.
+    """
+    cache = st.session_state.setdefault("datasets", {})
+    disk_cache = get_result_cache()
+    keys = {job.name: cache_key(job.values_file, job.labels_file, name=job.name, unique_id_col=job.unique_id_col)
+            for job in jobs}
+    for job in jobs:
+        key = keys[job.name]
+        if key in cache:
+            # Most recently used last, so eviction drops the stalest upload
+            cache[key] = cache.pop(key)
+        elif disk_cache is not None:
+            result = disk_cache.load(key)
+            if result is not None:
+                result.title = job.title or job.name
+                cache[key] = result
+    merged = run_datasets([job for job in jobs if keys[job.name] not in cache], trace_memory=trace_memory)
+    for name, result in merged.items():
+        # Failed merges are reported but not cached, so a retry runs again
+        if result.ok:
+            result.cache_key = keys[name]
+            cache[keys[name]] = result
+            persist(result)
+    results = {name: cache.get(key) or merged[name] for name, key in keys.items()}
+    # Keep only the most recently used uploads, never the ones just returned
+    in_use = set(keys.values())
+    for key in [key for key in cache if key not in in_use][:max(0, len(cache) - MAX_CACHED_DATASETS)]:
+        del cache[key]
+    return results
+
+def get_artifact(result, kind):
+    """Builds an export for a merged dataset once and reuses the bytes afterwards."""
+    if kind not in result.artifacts:
+        result.artifacts[kind] = build_export(result, kind)
+        persist(result)
+    return result.artifacts[kind]
+
+def lazy_download(result, kind, label, key, **download_args):
+    """
+    Download button for an export that is only generated when asked for. Until then a
+    "Prepare" button is shown; once built, the bytes stay cached with the dataset.
+    """
+    if kind in result.export_errors:
+        st.error(f"{label}: {result.export_errors[kind]}")
+    if kind not in result.artifacts:
+        if not st.button(f"⚙️ Prepare {label}", key=f"prep_{key}", use_container_width=True):
+            return
+        with st.spinner(f"Generating {label}..."):
+            try:
+                get_artifact(result, kind)
+            except Exception as e:
+                st.error(f"{label}: {e}")
+                return
+    st.download_button(
+        label=f"📥 {label}",
+        data=result.artifacts[kind],
+        use_container_width=True,
+        key=key,
+        **download_args
+    )
+
+def render_downloads(result, prefix):
+    """Download buttons for one dataset; each file is generated on request and kept."""
+    st.write(f"**{result.title}**")
+    if not result.ok:
+        st.error(f"Processing failed: {result.error}")
+        return
+    base_name = result.title.replace('-', '_')
+    lazy_download(
+        result, output_format,
+        label=f"{output_name} Data",
+        key=f"dl_{prefix}_data_{output_format}",
+        file_name=f"{base_name}_Merged.{output_ext}",
+        mime=output_mime
+    )
+    lazy_download(
+        result, "docx",
+        label="Data Dictionary (DOCX)",
+        key=f"dl_{prefix}_dict",
+        file_name=f"{base_name}_Dictionary.docx",
+        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    )
+    # SPSS-ready CSV straight from the merged data (no XLSX round trip)
+    lazy_download(
+        result, "spss_csv",
+        label="SPSS-Ready CSV",
+        key=f"dl_{prefix}_spss",
+        file_name=f"{base_name}_SPSS.csv",
+        mime="text/csv"
+    )
+    # Same data as a labelled .sav (question text + answer labels embedded)
+    lazy_download(
+        result, "sav",
+        label="SPSS Data (.sav)",
+        key=f"dl_{prefix}_sav",
+        file_name=f"{base_name}.sav",
+        mime="application/x-spss-sav"
+    )
+
 # --- Processing Logic ---
 if process_btn:
     # 1. Validation Logic
@@ -87,162 +237,19 @@ if process_btn:
         
     try:
         with st.spinner("Processing datasets..."):
-            
-            # --- PRE-SURVEY PROCESSING ---
-            pre_data = None
-            pre_merged_df = None
-            if has_pre:
-                # Reset file pointers just in case
-                pre_values_file.seek(0)
-                pre_labels_file.seek(0)
-                # Pass 'pre' to trigger Q22 -> RecordID (pre) renaming
-                pre_merged_df = process_survey_data(pre_values_file, pre_labels_file, dataset_name='pre', unique_id_col=pre_unique_id_col)
-                
-                # Generate Output
-                pre_output = io.BytesIO()
-                with pd.ExcelWriter(pre_output, engine='openpyxl') as writer:
-                    pre_merged_df.to_excel(writer, sheet_name='Pre-Survey', index=False)
-                pre_data = pre_output.getvalue()
-
-            # --- POST-SURVEY PROCESSING ---
-            post_data = None
-            post_merged_df = None
-            if has_post:
-                post_values_file.seek(0)
-                post_labels_file.seek(0)
-                # Pass 'post' to trigger Q22 -> RecordID (post) renaming
-                post_merged_df = process_survey_data(post_values_file, post_labels_file, dataset_name='post', unique_id_col=post_unique_id_col)
-                
-                # Generate Output
-                post_output = io.BytesIO()
-                with pd.ExcelWriter(post_output, engine='openpyxl') as writer:
-                    post_merged_df.to_excel(writer, sheet_name='Post-Survey', index=False)
-                post_data = post_output.getvalue()
-            
-            # 5. Success & Downloads
-            st.success("✅ Processing complete! Download your files below.")
-            
-            # --- Dynamic Download Columns ---
-            # We want to offer: Pre Data, Post Data, Pre Dict (DOCX), Post Dict (DOCX)
-            # User asked for "a third download button adjacent"
-            # It might be cleaner to group Pre downloads together and Post downloads together, 
-            # OR have Data Layout and Dict Layout.
-            # "I want a third download button adjacent to the pre and post download buttons."
-            # Maybe 3 columns: Pre Data | Post Data | Dictionary (if applicable)
-            # Actually, dictionary is per dataset. So if we have Pre, we have Pre Dict. 
-            # The prompt implies one general desire, but logically we need two dictionaries if we have two datasets, 
-            # or maybe the user implies one combined? Usually they are separate.
-            # Let's create dictionary for EACH available dataset.
-            
-            download_cols = st.columns(3)
-            
-            # Col 1: Pre Survey Downloads
+            jobs = []
+            # Dataset names 'pre'/'post' trigger the Q22 -> RecordID (pre/post) renaming
             if has_pre:
-                with download_cols[0]:
-                    st.write("**Pre-Survey**")
-                    st.download_button(
-                        label="📥 Excel Data",
-                        data=pre_data,
-                        file_name="Pre_Survey_Merged.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                        use_container_width=True,
-                        key="dl_pre_data"
-                    )
-                    # Generate Pre Dict
-                    pre_dict_io = generate_docx_dictionary(pre_merged_df)
-                    st.download_button(
-                        label="📘 Data Dictionary (DOCX)",
-                        data=pre_dict_io,
-                        file_name="Pre_Survey_Dictionary.docx",
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                        use_container_width=True,
-                        key="dl_pre_dict"
-                    )
-
-            # Col 2: Post Survey Downloads
-            if has_post:
-                with download_cols[1]:
-                    st.write("**Post-Survey**")
-                    st.download_button(
-                        label="📥 Excel Data",
-                        data=post_data,
-                        file_name="Post_Survey_Merged.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                        use_container_width=True,
-                        key="dl_post_data"
-                    )
-                    # Generate Post Dict
-                    post_dict_io = generate_docx_dictionary(post_merged_df)
-                    st.download_button(
-                        label="📘 Data Dictionary (DOCX)",
-                        data=post_dict_io,
-                        file_name="Post_Survey_Dictionary.docx",
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                        use_container_width=True,
-                        key="dl_post_dict"
-                    )
-            
-            st.divider()
-            
-            # Previews
-            st.subheader("Data Previews")
-            
-            if has_pre:
-                with st.expander("Preview: Pre-Survey Data (First 5 Rows)", expanded=True):
-                    st.dataframe(pre_merged_df.head(), use_container_width=True)
-            
+                jobs.append(DatasetJob("pre", pre_values_file, pre_labels_file, pre_unique_id_col, title="Pre-Survey"))
             if has_post:
-                with st.expander("Preview: Post-Survey Data (First 5 Rows)", expanded=True):
-                    st.dataframe(post_merged_df.head(), use_container_width=True)
-            
-            # --- KPIs / Statistics ---
-            st.write("---")
-            st.subheader("Dataset Statistics")
-            
-            # Calculate Counts & Duplicates
-            # Helper to find ID column for duplicates
-            def get_duplicates(df):
-                if df is None: return 0, []
-                # Look for column starting with RecordID and ending with (Value)
-                target_col = "RecordID (Value)"
-                if target_col in df.columns:
-                    dupes = df[df.duplicated(subset=[target_col], keep=False)]
-                    if not dupes.empty:
-                        # Return count and list of unique duplicate IDs
-                        return len(dupes), dupes[target_col].unique().tolist()
-                return 0, []
-
-            num_pre = len(pre_merged_df) if has_pre and pre_merged_df is not None else 0
-            num_post = len(post_merged_df) if has_post and post_merged_df is not None else 0
-            total_rows = num_pre + num_post
-            
-            dupe_count_pre, dupes_pre_list = get_duplicates(pre_merged_df)
-            dupe_count_post, dupes_post_list = get_duplicates(post_merged_df)
-            
-            # Row 1: Counts
-            kpi1, kpi2, kpi3 = st.columns(3)
-            with kpi1:
-                st.metric(label="Total Combined Rows", value=total_rows)
-            with kpi2:
-                st.metric(label="Pre-Survey Rows", value=num_pre)
-            with kpi3:
-                st.metric(label="Post-Survey Rows", value=num_post)
-                
-            # Row 2: Duplicates
-            st.caption("Duplicate Detection based on 'RecordID' column:")
-            d1, d2, d3 = st.columns(3)
-            with d2:
-                st.metric(label="Pre-Survey Duplicates", value=dupe_count_pre, delta_color="inverse")
-                if dupe_count_pre > 0:
-                     with st.expander("View Pre-Survey Duplicates"):
-                          st.write(dupes_pre_list)
-            with d3:
-                st.metric(label="Post-Survey Duplicates", value=dupe_count_post, delta_color="inverse")
-                if dupe_count_post > 0:
-                     with st.expander("View Post-Survey Duplicates"):
-                          st.write(dupes_post_list)
+                jobs.append(DatasetJob("post", post_values_file, post_labels_file, post_unique_id_col, title="Post-Survey"))
+
+            # Pre and post are independent and are merged concurrently
+            # Shown on every rerun until the next "Process & Merge" click
+            st.session_state["results"] = load_datasets(jobs)
 
     except Exception as e:
+        st.session_state.pop("results", None)
         st.error(f"An error occurred during processing: {str(e)}")
         # Attempt reset
         if pre_labels_file: pre_labels_file.seek(0)
@@ -250,111 +257,271 @@ if process_btn:
         if post_labels_file: post_labels_file.seek(0)
         if post_values_file: post_values_file.seek(0)
 
+# Disk cache usage (after processing, so this run's lookups are counted)
+disk_cache = get_result_cache()
+if disk_cache is not None:
+    cache_stats = disk_cache.stats()
+    st.sidebar.caption(
+        f"Disk cache: {cache_stats['entries']} datasets, {cache_stats['bytes'] / 1e6:.1f} / "
+        f"{cache_stats['max_bytes'] / 1e6:.0f} MB · {cache_stats['hits']} hits, {cache_stats['misses']} misses"
+    )
+
+# --- Results (persist across reruns) ---
+results = st.session_state.get("results")
+if results:
+    pre_result = results.get("pre")
+    post_result = results.get("post")
+    pre_merged_df = pre_result.df if pre_result else None
+    post_merged_df = post_result.df if post_result else None
+
+    try:
+        # 5. Success & Downloads
+        if all(result.ok for result in results.values()):
+            st.success("✅ Processing complete! Prepare and download your files below.")
+        elif any(result.ok for result in results.values()):
+            st.warning("⚠️ Some datasets could not be processed; see the errors below.")
+
+        # Builds every missing export of every dataset at once on the worker pool
+        if st.button("⚡ Prepare All Downloads", key="prep_all"):
+            with st.spinner("Generating all files..."):
+                run_exports(results.values(), [output_format, "docx", "spss_csv", "sav"])
+                for result in results.values():
+                    persist(result)
+        
+        # --- Dynamic Download Columns ---
+        # We want to offer: Pre Data, Post Data, Pre Dict (DOCX), Post Dict (DOCX)
+        # User asked for "a third download button adjacent"
+        # It might be cleaner to group Pre downloads together and Post downloads together, 
+        # OR have Data Layout and Dict Layout.
+        # "I want a third download button adjacent to the pre and post download buttons."
+        # Maybe 3 columns: Pre Data | Post Data | Dictionary (if applicable)
+        # Actually, dictionary is per dataset. So if we have Pre, we have Pre Dict. 
+        # The prompt implies one general desire, but logically we need two dictionaries if we have two datasets, 
+        # or maybe the user implies one combined? Usually they are separate.
+        # Let's create dictionary for EACH available dataset.
+        
+        download_cols = st.columns(3)
+        
+        # Col 1: Pre Survey Downloads
+        if pre_result:
+            with download_cols[0]:
+                render_downloads(pre_result, "pre")
+
+        # Col 2: Post Survey Downloads
+        if post_result:
+            with download_cols[1]:
+                render_downloads(post_result, "post")
+        
+        st.divider()
+        
+        # Explorer: filtering and paging run here on the server (see explorer.py);
+        # only the visible page is sent to the browser
+        st.subheader("Explore Data")
+        explorable = {result.title: result for result in (pre_result, post_result) if result is not None and result.ok}
+        if explorable:
+            e1, e2, e3 = st.columns([1, 1, 1])
+            with e1:
+                explore_title = st.radio("Dataset", list(explorable), horizontal=True, key="explore_dataset")
+            with e2:
+                explore_show = st.selectbox("Columns", SHOW_OPTIONS, key="explore_show",
+                                            format_func={'both': "Values and labels", 'values': "Values only", 'labels': "Labels only"}.get)
+            with e3:
+                page_size = st.selectbox("Rows per page", [25, 100, 500], index=1, key="explore_page_size")
+            f1, f2, f3 = st.columns(3)
+            with f1:
+                explore_qids = st.text_input("Questions (QIDs)", key="explore_qids",
+                                             help="Comma-separated, e.g. 'Q1, Q5'. A block parent such as Q5 shows Q5_1, Q5_2, ... Empty shows all.")
+            with f2:
+                explore_ids = st.text_input("RecordIDs", key="explore_ids",
+                                            help="Comma-separated; matches ignore whitespace, leading zeros and number/text differences.")
+            with f3:
+                explore_ranges = st.text_input("Value filters", key="explore_ranges",
+                                               help="Comma-separated, e.g. 'Q3=4..5, Q7=2, Q9=..3'. Rows must match every filter.")
+            try:
+                view = explorable[explore_title].explorer.query(
+                    parse_list(explore_qids), parse_list(explore_ids), parse_ranges(explore_ranges), explore_show
+                )
+            except ValueError as e:
+                st.warning(str(e))
+            else:
+                n_pages = view.n_pages(page_size)
+                # The widget's value lives only in session state (seeded once), so it can be
+                # pulled back when narrower filters leave fewer pages than the one last shown
+                st.session_state.setdefault("explore_page", 1)
+                if st.session_state["explore_page"] > n_pages:
+                    st.session_state["explore_page"] = n_pages
+                page_number = st.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, step=1, key="explore_page")
+                page = view.page(int(page_number), page_size)
+                st.dataframe(page, use_container_width=True)
+                first = (int(page_number) - 1) * page_size
+                st.caption(
+                    f"Rows {first + 1 if len(page) else 0}-{first + len(page)} of {len(view)} matching "
+                    f"({len(explorable[explore_title].df)} total), {len(view.columns)} columns. "
+                    "'Row' is the 0-based row position in the merged file."
+                )
+        
+        # --- KPIs / Statistics ---
+        st.write("---")
+        st.subheader("Dataset Statistics")
+        
+        # Calculate Counts & Duplicates
+        # RecordIDs are compared after normalization (whitespace, leading zeros,
+        # 1046 vs '1046'), using each dataset's RecordIndex (built once, then reused)
+        def get_duplicates(result):
+            if result is None or not result.ok: return 0, None, 0
+            index = result.record_index
+            return int(index.duplicate_rows().sum()), index.duplicate_groups(), len(index.missing)
+
+        num_pre = len(pre_merged_df) if pre_merged_df is not None else 0
+        num_post = len(post_merged_df) if post_merged_df is not None else 0
+        total_rows = num_pre + num_post
+        
+        dupe_count_pre, dupes_pre, missing_pre = get_duplicates(pre_result)
+        dupe_count_post, dupes_post, missing_post = get_duplicates(post_result)
+        
+        # Row 1: Counts
+        kpi1, kpi2, kpi3 = st.columns(3)
+        with kpi1:
+            st.metric(label="Total Combined Rows", value=total_rows)
+        with kpi2:
+            st.metric(label="Pre-Survey Rows", value=num_pre)
+        with kpi3:
+            st.metric(label="Post-Survey Rows", value=num_post)
+            
+        # Row 2: Duplicates
+        st.caption("Duplicate Detection based on 'RecordID' column (ignoring whitespace, leading zeros and number/text differences):")
+        d1, d2, d3 = st.columns(3)
+        for column, label, dupe_count, dupes, missing in (
+            (d2, "Pre-Survey", dupe_count_pre, dupes_pre, missing_pre),
+            (d3, "Post-Survey", dupe_count_post, dupes_post, missing_post),
+        ):
+            with column:
+                st.metric(label=f"{label} Duplicates", value=dupe_count, delta_color="inverse")
+                if dupe_count > 0:
+                    with st.expander(f"View {label} Duplicates"):
+                        st.caption("'Rows' are 0-based row positions in the merged file; 'normalized' groups only match after cleaning the IDs.")
+                        st.dataframe(dupes, hide_index=True, use_container_width=True)
+                if missing:
+                    st.caption(f"{missing} row(s) without a RecordID.")
+
+        # Per-stage timings of this session's merges and exports (cached results have none)
+        reports = [result.report for result in results.values() if result.report is not None and result.report.stages]
+        if reports:
+            with st.expander("⏱️ Performance Report"):
+                report_frame = pd.concat([report.to_frame() for report in reports], ignore_index=True)
+                st.dataframe(report_frame, hide_index=True, use_container_width=True)
+                st.caption(
+                    f"Total: {report_frame['Seconds'].sum():.2f}s. Stages: header build, parse, "
+                    "validation (row alignment, label check), merge, serialize (one per export)."
+                )
+        else:
+            st.caption("⏱️ Loaded from cache; no stages were run.")
+
+        # Value search across both merged datasets (IDs, codes or answer text)
+        with st.expander("🔎 Find Values"):
+            search_text = st.text_input(
+                "Values to find (comma-separated)",
+                value="",
+                help="Matches ignore whitespace, leading zeros and number/text differences, e.g. '1046, 1019'."
+            )
+            targets = [target.strip() for target in search_text.split(",") if target.strip()]
+            if targets:
+                for result in (pre_result, post_result):
+                    if result is not None and result.ok:
+                        matches = result.cell_index.search(targets)
+                        st.write(f"**{result.title}**: {len(matches)} match(es)")
+                        missing_targets = [t for t in targets if t not in set(matches["Target"])]
+                        if missing_targets:
+                            st.caption(f"Not found: {', '.join(missing_targets)}")
+                        if len(matches):
+                            st.dataframe(matches, hide_index=True, use_container_width=True)
+
+        # Row 3: Pre/Post Linkage (respondents matched across waves by normalized RecordID)
+        if pre_result is not None and pre_result.ok and post_result is not None and post_result.ok:
+            st.subheader("🔗 Pre/Post Linkage")
+            link_key = (pre_result.cache_key, post_result.cache_key)
+            linked = st.session_state.get("linkage")
+            if linked is None or linked[0] != link_key:
+                if st.button("🔗 Link Pre and Post Respondents", key="link_waves"):
+                    with st.spinner("Linking respondents..."):
+                        linkage = link_waves(
+                            pre_merged_df, post_merged_df, pre_result.codebook, post_result.codebook,
+                            how="outer", pre_index=pre_result.record_index, post_index=post_result.record_index
+                        )
+                    linked = (link_key, linkage)
+                    st.session_state["linkage"] = linked
+            if linked is not None and linked[0] == link_key:
+                linkage = linked[1]
+                summary = linkage.summary
+                l1, l2, l3, l4 = st.columns(4)
+                l1.metric("Linked Respondents", summary['linked'])
+                l2.metric("Pre Only", summary['pre_only'])
+                l3.metric("Post Only", summary['post_only'])
+                l4.metric("Duplicated IDs", summary['duplicate_ids'])
+                if len(linkage.unmatched):
+                    with st.expander("View Unmatched IDs"):
+                        st.dataframe(linkage.unmatched, hide_index=True, use_container_width=True)
+                if len(linkage.duplicates):
+                    with st.expander("View Duplicate-Matched IDs (first row of each wave is linked)"):
+                        st.dataframe(linkage.duplicates, hide_index=True, use_container_width=True)
+                st.download_button(
+                    label="📥 Linked Pre/Post Data (SPSS-Ready CSV)",
+                    data=linkage.data.to_csv(index=False).encode('utf-8'),
+                    file_name="Linked_Pre_Post_SPSS.csv",
+                    mime="text/csv",
+                    key="dl_linked"
+                )
+
+    except Exception as e:
+        st.error(f"An error occurred while preparing the downloads: {str(e)}")
+
 # --- SPSS Preparation Section ---
 st.write("---")
-st.header("Step 2: Prepare for SPSS (CSV Export)")
+st.header("Step 2: Prepare for SPSS (CSV / .sav Export)")
 
 st.markdown("""
-Upload your **merged Excel files** (generated above) to convert them into SPSS-ready CSVs.
+SPSS-ready CSVs for the datasets processed above are already offered next to their merged data downloads.
+Use this step for **merged files** saved earlier (Excel, CSV, Parquet or Feather).
 *   Removes duplicate ID columns.
 *   Renames columns with `pre_` or `post_` prefixes.
+*   The `.sav` file also carries the question texts and answer labels.
 """)
 
 col_spss_pre, col_spss_post = st.columns(2)
 
 with col_spss_pre:
     st.subheader("Process Pre-Survey")
-    spss_pre_file = st.file_uploader("Upload Merged Pre-Survey (XLSX)", type=['xlsx'], key="spss_pre")
+    spss_pre_file = st.file_uploader("Upload Merged Pre-Survey (XLSX, CSV, Parquet or Feather)", type=list(MERGED_FILE_TYPES), key="spss_pre")
 
 with col_spss_post:
     st.subheader("Process Post-Survey")
-    spss_post_file = st.file_uploader("Upload Merged Post-Survey (XLSX)", type=['xlsx'], key="spss_post")
+    spss_post_file = st.file_uploader("Upload Merged Post-Survey (XLSX, CSV, Parquet or Feather)", type=list(MERGED_FILE_TYPES), key="spss_post")
 
-import re
-
-def clean_for_spss(df, prefix):
+def load_merged_upload(file, prefix):
     """
-    Cleans DataFrame for SPSS:
-    1. Removes 'RecordID (Value)' column.
-    2. Renames 'RecordID (Label)' -> 'RecordID'.
-    3. For all other questions:
-       - DROPS the Text Label column (e.g. "Q1 (Label)")
-       - KEEPS the Numeric Value column (e.g. "Q1 (Value)")
-       - Renames the Value column to "{prefix}_{Qnumber}" (e.g. pre_Q1)
+    Reads an uploaded merged file once per content and keeps it as a DatasetResult, so
+    reruns reuse the frame and its SPSS exports are only built when asked for.
     """
-    # 1 & 2. Handle RecordID
-    # Drop Value version
-    if "RecordID (Value)" in df.columns:
-        df = df.drop(columns=["RecordID (Value)"])
-    if "RecordID" in df.columns: # Sometimes merged file might have it as just RecordID if saved that way?
-         pass # Actually clean_for_spss is typically run on the merged output which has (Value) and (Label)
-    
-    # Rename Label version
-    if "RecordID (Label)" in df.columns:
-        df = df.rename(columns={"RecordID (Label)": "RecordID"})
-        
-    # 3. Rename others
-    new_cols = {}
-    cols_to_drop = []
-    
-    for col in df.columns:
-        if col == "RecordID":
-            continue
-            
-        # Regex to find Q numbers (e.g. "Q1. Question Text (Value)")
-        match = re.match(r"^(Q[\d_]+)", col)
-        if match:
-            q_part = match.group(1) # e.g. Q1
-            
-            if "(Label)" in col:
-                # DROP text labels for SPSS
-                cols_to_drop.append(col)
-            
-            elif "(Value)" in col:
-                # KEEP numerical values and rename
-                # e.g. pre_Q1
-                new_name = f"{prefix}_{q_part}"
-                new_cols[col] = new_name
-            
-    # Apply changes
-    df = df.drop(columns=cols_to_drop)
-    df = df.rename(columns=new_cols)
-    
-    return df
+    uploads = st.session_state.setdefault("merged_uploads", {})
+    key = (file.name, hashlib.sha256(file.getvalue()).hexdigest())
+    if prefix not in uploads or uploads[prefix][0] != key:
+        result = DatasetResult(prefix, f"{prefix.title()}-Survey", df=read_merged_file(file))
+        uploads[prefix] = (key, result)
+    return uploads[prefix][1]
 
-if spss_pre_file:
-    try:
-        df_pre = pd.read_excel(spss_pre_file)
-        df_pre_clean = clean_for_spss(df_pre, "pre")
-        
-        csv_pre = df_pre_clean.to_csv(index=False).encode('utf-8')
-        
-        col_spss_pre.download_button(
-            label="📥 Download SPSS-Ready CSV (Pre)",
-            data=csv_pre,
-            file_name="Pre_Survey_SPSS.csv",
-            mime="text/csv"
-        )
-        col_spss_pre.success("Ready for download!")
-    except Exception as e:
-        col_spss_pre.error(f"Error: {e}")
-
-if spss_post_file:
-    try:
-        df_post = pd.read_excel(spss_post_file)
-        df_post_clean = clean_for_spss(df_post, "post")
-        
-        csv_post = df_post_clean.to_csv(index=False).encode('utf-8')
-        
-        col_spss_post.download_button(
-            label="📥 Download SPSS-Ready CSV (Post)",
-            data=csv_post,
-            file_name="Post_Survey_SPSS.csv",
-            mime="text/csv"
-        )
-        col_spss_post.success("Ready for download!")
-    except Exception as e:
-        col_spss_post.error(f"Error: {e}")
+for spss_file, prefix, column in ((spss_pre_file, "pre", col_spss_pre), (spss_post_file, "post", col_spss_post)):
+    if not spss_file:
+        continue
+    label = prefix.title()
+    with column:
+        try:
+            result = load_merged_upload(spss_file, prefix)
+            lazy_download(result, "spss_csv", f"SPSS-Ready CSV ({label})", f"dl_upload_{prefix}_spss",
+                          file_name=f"{label}_Survey_SPSS.csv", mime="text/csv")
+            lazy_download(result, "sav", f"SPSS Data (.sav, {label})", f"dl_upload_{prefix}_sav",
+                          file_name=f"{label}_Survey.sav", mime="application/x-spss-sav")
+        except Exception as e:
+            st.error(f"Error: {e}")
 
 # --- Footer ---
 st.write("---")
@@ -0,0 +1,235 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+import pandas as pd
+from pipeline import DatasetJob, run_datasets
+from processing import OUTPUT_FORMATS
+
+# Export kind -> output file name (the merged data file name depends on the format)
+OUTPUT_FILES = {
+    'docx': "dictionary.docx",
+    'spss_csv': "spss.csv",
+    'sav': "spss.sav",
+}
+
+@dataclass
+class Study:
+    """
+    One study to process in a batch.
+
+    Attributes:
+        name: Study name, also the name of its output folder.
+        values_file: Path of the 'Numeric Values' export.
+        labels_file: Path of the 'Choice Text' export.
+        unique_id_col: QID of the unique identifier column.
+        prefix: SPSS variable prefix (e.g. 'pre' -> pre_Q1).
+    """
+    name: str
+    values_file: str
+    labels_file: str
+    unique_id_col: str = 'Q2'
+    prefix: str = 'pre'
+
+def _prefix_for(name):
+    """SPSS prefix derived from a study or file name ('pre_values' -> 'pre')."""
+    prefix = re.sub(r'\W+', '_', name).strip('_')
+    return prefix if re.match(r'[A-Za-z]', prefix) else f"s_{prefix}"
+
+def discover_studies(directory, unique_id_col='Q2'):
+    """
+    Finds values/labels export pairs under a directory: every '*values*.csv' with a
+    matching '*labels*.csv' (same name, 'values' replaced by 'labels') is one study.
+
+    Args:
+        directory: Folder to search recursively.
+        unique_id_col: Unique ID QID used for every study found.
+
+    Returns:
+        list: Study objects sorted by name.
+    """
+    studies = []
+    for root, _, files in os.walk(directory):
+        for file_name in files:
+            match = re.match(r'(?i)(.*)values(.*)\.csv$', file_name)
+            if not match:
+                continue
+            labels_name = next((f for f in files if f.lower() == f"{match.group(1)}labels{match.group(2)}.csv".lower()), None)
+            values_path = os.path.join(root, file_name)
+            if labels_name is None:
+                print(f"WARNING: No labels file next to {values_path}; skipped.")
+                continue
+            stem = (match.group(1) + match.group(2)).strip('_- ') or os.path.basename(root)
+            relative = os.path.relpath(os.path.join(root, stem), directory)
+            studies.append(Study(
+                name=re.sub(r'[\\/]+', '_', relative),
+                values_file=values_path,
+                labels_file=os.path.join(root, labels_name),
+                unique_id_col=unique_id_col,
+                prefix=_prefix_for(stem),
+            ))
+    return sorted(studies, key=lambda study: study.name)
+
+def read_manifest(path, unique_id_col='Q2'):
+    """
+    Reads studies from a manifest: a CSV with a header row, or a JSON list of objects.
+
+    Each entry needs 'values' and 'labels' paths (relative to the manifest) and may set
+    'study', 'unique_id_col' and 'prefix'.
+
+    Returns:
+        list: Study objects in manifest order.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        rows = json.load(f) if path.lower().endswith('.json') else list(csv.DictReader(f))
+
+    studies = []
+    for i, row in enumerate(rows, start=1):
+        row = {str(k).strip(): str(v).strip() for k, v in row.items() if v not in (None, '')}
+        if 'values' not in row or 'labels' not in row:
+            raise ValueError(f"Manifest entry {i} needs both 'values' and 'labels' paths.")
+        name = row.get('study') or os.path.splitext(os.path.basename(row['values']))[0]
+        studies.append(Study(
+            name=re.sub(r'[\\/:]+', '_', name),
+            values_file=os.path.join(base, row['values']),
+            labels_file=os.path.join(base, row['labels']),
+            unique_id_col=row.get('unique_id_col') or unique_id_col,
+            prefix=row.get('prefix') or _prefix_for(re.sub(r'(?i)_?values', '', name) or name),
+        ))
+    return studies
+
+def process_study(study, output_dir, data_format='xlsx', outputs=('data', 'docx', 'spss_csv', 'sav'), profile=False):
+    """
+    Merges one study and writes its outputs to output_dir/<study name>/. Runs in a
+    worker process, so only the small summary dict travels back.
+
+    Returns:
+        dict: name, ok, error, rows, columns, input_bytes, seconds, the files written
+        and the per-stage report.
+    """
+    if profile:
+        # Worker processes log their stages as JSON lines too
+        logging.basicConfig(level=logging.INFO, format='%(message)s')
+    start = time.perf_counter()
+    exports = [data_format if kind == 'data' else kind for kind in outputs]
+    job = DatasetJob(study.prefix, study.values_file, study.labels_file, study.unique_id_col, title=study.prefix)
+    result = run_datasets([job], exports, max_workers=1, trace_memory=profile)[study.prefix]
+    for stats in result.report.stages:
+        stats.dataset = study.name
+
+    summary = {
+        'name': study.name,
+        'ok': result.ok and not result.export_errors,
+        'error': result.error or "; ".join(f"{k}: {v}" for k, v in result.export_errors.items()) or None,
+        'rows': 0 if result.df is None else len(result.df),
+        'columns': 0 if result.df is None else len(result.df.columns),
+        'input_bytes': sum(os.path.getsize(p) for p in (study.values_file, study.labels_file) if os.path.exists(p)),
+        'files': [],
+        'report': result.report,
+    }
+    if result.ok:
+        study_dir = os.path.join(output_dir, study.name)
+        os.makedirs(study_dir, exist_ok=True)
+        for kind, data in result.artifacts.items():
+            file_name = OUTPUT_FILES.get(kind, f"merged.{OUTPUT_FORMATS[data_format][1]}")
+            path = os.path.join(study_dir, file_name)
+            with open(path, 'wb') as f:
+                f.write(data)
+            summary['files'].append(path)
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+def run_batch(studies, output_dir, data_format='xlsx', outputs=('data', 'docx', 'spss_csv', 'sav'), workers=None, profile=False):
+    """
+    Processes studies in parallel on a process pool, printing one line per finished study.
+
+    Returns:
+        list: The summary dict of every study, in completion order.
+    """
+    summaries = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        futures = {pool.submit(process_study, study, output_dir, data_format, outputs, profile): study for study in studies}
+        for i, future in enumerate(as_completed(futures), start=1):
+            study = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:  # e.g. the worker process died
+                summary = {'name': study.name, 'ok': False, 'error': str(e), 'rows': 0, 'columns': 0,
+                           'input_bytes': 0, 'files': [], 'seconds': 0.0, 'report': None}
+            status = "ok" if summary['ok'] else f"FAILED: {summary['error']}"
+            print(f"[{i}/{len(studies)}] {summary['name']}: {summary['rows']} rows x {summary['columns']} cols "
+                  f"in {summary['seconds']:.2f}s - {status}")
+            summaries.append(summary)
+    return summaries
+
+def print_summary(summaries, wall_time):
+    """Prints the throughput summary of a batch run."""
+    done = [s for s in summaries if s['ok']]
+    rows = sum(s['rows'] for s in done)
+    megabytes = sum(s['input_bytes'] for s in done) / 1e6
+    busy = sum(s['seconds'] for s in summaries)
+    print("\n--- Batch Summary ---")
+    print(f"Studies:     {len(done)} ok, {len(summaries) - len(done)} failed")
+    print(f"Rows:        {rows}")
+    print(f"Input:       {megabytes:.1f} MB")
+    print(f"Wall time:   {wall_time:.2f}s (worker time {busy:.2f}s, {busy / wall_time if wall_time else 0:.1f}x parallel)")
+    print(f"Throughput:  {rows / wall_time if wall_time else 0:,.0f} rows/s, {megabytes / wall_time if wall_time else 0:.1f} MB/s, "
+          f"{len(summaries) / wall_time * 60 if wall_time else 0:.1f} studies/min")
+    for s in summaries:
+        if not s['ok']:
+            print(f"FAILED {s['name']}: {s['error']}")
+
+def print_stage_report(summaries):
+    """Prints the time and throughput of each stage summed over all studies, with the largest per-study peaks."""
+    frames = [s['report'].to_frame() for s in summaries if s['report'] is not None and s['report'].stages]
+    if not frames:
+        return
+    stages = pd.concat(frames, ignore_index=True).groupby("Stage", sort=False).agg(
+        {"Seconds": "sum", "Peak MB": "max", "Arrow MB": "max", "Rows": "sum"})
+    stages["Rows/s"] = (stages["Rows"] / stages["Seconds"].where(stages["Seconds"] > 0)).round(0)
+    stages["Share"] = (stages["Seconds"] / stages["Seconds"].sum()).map("{:.0%}".format)
+    print("\n--- Stage Report (times and rows summed over studies; memory is the largest study's peak) ---")
+    print(stages.to_string())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge many Qualtrics values/labels exports without the Streamlit UI.")
+    parser.add_argument("input", help="Directory to scan for *values*.csv / *labels*.csv pairs, or a manifest (.csv or .json).")
+    parser.add_argument("-o", "--output", default="batch_output", help="Output directory (one folder per study).")
+    parser.add_argument("--unique-id", default="Q2", help="Unique ID column for studies that do not set their own.")
+    parser.add_argument("--format", default="xlsx", choices=list(OUTPUT_FORMATS), help="Format of the merged data file.")
+    parser.add_argument("--outputs", nargs="+", default=['data', 'docx', 'spss_csv', 'sav'],
+                        choices=['data', 'docx', 'spss_csv', 'sav'], help="Files to write for each study.")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Worker processes (default: one per CPU).")
+    parser.add_argument("--profile", action="store_true",
+                        help="Trace memory, log every stage as a JSON line and print a per-stage report (slower).")
+    args = parser.parse_args(argv)
+    if args.profile:
+        logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if os.path.isdir(args.input):
+        studies = discover_studies(args.input, args.unique_id)
+    else:
+        studies = read_manifest(args.input, args.unique_id)
+    if not studies:
+        parser.error(f"No values/labels pairs found in {args.input}")
+    names = [study.name for study in studies]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        parser.error(f"Study names must be unique (they name the output folders): {', '.join(duplicates)}")
+
+    print(f"Processing {len(studies)} studies into {args.output}...")
+    start = time.perf_counter()
+    summaries = run_batch(studies, args.output, args.format, args.outputs, args.workers, args.profile)
+    print_summary(summaries, time.perf_counter() - start)
+    if args.profile:
+        print_stage_report(summaries)
+    return 0 if all(s['ok'] for s in summaries) else 1
+
+if __name__ == "__main__":
+    raise SystemExit(main())
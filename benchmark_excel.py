@@ -0,0 +1,49 @@
+import argparse
+import io
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+from benchmark_merge import write_raw_exports
+from processing import process_survey_data, write_merged_excel
+
+def pandas_excel(df):
+    """The pd.ExcelWriter export app.py used before the write-only writer."""
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='Survey', index=False)
+    return output
+
+def measure(func, df, trace):
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    output = func(df)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] if trace else None
+    if trace:
+        tracemalloc.stop()
+    return elapsed, peak, len(output.getvalue())
+
+def main():
+    parser = argparse.ArgumentParser(description="Before/after benchmark of the merged XLSX export.")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--memory", action="store_true", help="Also report peak Python allocations (slower).")
+    args = parser.parse_args()
+
+    print(f"Building merged dataset: {args.rows} rows x {args.questions} questions...")
+    with tempfile.TemporaryDirectory() as tmp:
+        values_path, labels_path, _ = write_raw_exports(tmp, args.rows, args.questions)
+        df = process_survey_data(values_path, labels_path)
+
+    for name, func in [("Streaming writer", lambda d: write_merged_excel(d, sheet_name='Survey')),
+                       ("pd.ExcelWriter", pandas_excel)]:
+        elapsed, peak, size = measure(func, df, args.memory)
+        line = f"{name:18s} {elapsed:8.2f}s  {size / 1e6:7.1f} MB xlsx"
+        if peak is not None:
+            line += f"  peak {peak / 1e6:8.1f} MB"
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import argparse
+import tempfile
+import time
+from benchmark_merge import write_raw_exports
+from processing import process_survey_data, read_merged_file, write_merged, OUTPUT_FORMATS
+
+def main():
+    parser = argparse.ArgumentParser(description="Write/reload timings of the merged dataset output formats.")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--formats", nargs="+", default=list(OUTPUT_FORMATS), choices=list(OUTPUT_FORMATS))
+    args = parser.parse_args()
+
+    print(f"Building merged dataset: {args.rows} rows x {args.questions} questions...")
+    with tempfile.TemporaryDirectory() as tmp:
+        values_path, labels_path, _ = write_raw_exports(tmp, args.rows, args.questions)
+        df = process_survey_data(values_path, labels_path)
+
+    print(f"{'Format':22s} {'write':>8s} {'reload':>8s} {'size':>9s}")
+    for fmt in args.formats:
+        start = time.perf_counter()
+        output = write_merged(df, fmt)
+        write_time = time.perf_counter() - start
+
+        output.name = f"merged.{OUTPUT_FORMATS[fmt][1]}"
+        start = time.perf_counter()
+        read_merged_file(output)
+        read_time = time.perf_counter() - start
+        print(f"{OUTPUT_FORMATS[fmt][0]:22s} {write_time:7.2f}s {read_time:7.2f}s {len(output.getvalue()) / 1e6:7.1f}MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import argparse
+import tempfile
+import time
+from processing import process_survey_data, ENGINES
+from benchmark_merge import write_raw_exports
+
+SAMPLES = [
+    ("pre_set", "pre_set/pre_values.csv", "pre_set/pre_labels.csv", "Q22"),
+    ("post_set", "post_set/post_values.csv", "post_set/post_labels.csv", "Q22"),
+]
+
+def time_engines(values_path, labels_path, unique_id_col, repeats):
+    """Returns the best-of-N wall time of process_survey_data for each concrete engine."""
+    timings = {}
+    for engine in ENGINES:
+        if engine == 'auto':
+            continue
+        best = None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            process_survey_data(values_path, labels_path, unique_id_col=unique_id_col, engine=engine)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings[engine] = best
+    return timings
+
+def report(name, timings):
+    pandas_time = timings['pandas']
+    arrow_time = timings['pyarrow']
+    print(f"{name:<28} pandas {pandas_time:8.3f}s   pyarrow {arrow_time:8.3f}s   speedup {pandas_time / arrow_time:5.1f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="Times process_survey_data with the pandas and pyarrow ingestion engines.")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    for name, values_path, labels_path, unique_id_col in SAMPLES:
+        report(name, time_engines(values_path, labels_path, unique_id_col, args.repeats))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        values_path, labels_path, _ = write_raw_exports(tmp, args.rows, args.questions)
+        report(f"synthetic {args.rows}x{args.questions}", time_engines(values_path, labels_path, "Q2", args.repeats))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from processing import _merge_blocks, QUALTRICS_METADATA_IDS
+
+LIKERT = np.array(["Strongly disagree", "Disagree", "Neutral", "Agree", "Strongly agree"], dtype=object)
+
+def write_raw_exports(directory, n_rows, n_questions, seed=0):
+    """
+    Writes a synthetic Qualtrics values/labels CSV pair in the 3-header-row export format:
+    17 metadata columns, RecordID (QID2_TEXT) in column R, then Likert questions.
+
+    Returns:
+        tuple: (values_path, labels_path, headers) where headers are the composite
+        headers process_survey_data builds for unique_id_col='Q2'.
+    """
+    rng = np.random.default_rng(seed)
+    n_cols = 17 + 1 + n_questions
+
+    codes = rng.integers(0, 5, size=(n_rows, n_questions))
+    values = np.empty((n_rows + 3, n_cols), dtype=object)
+    labels = np.empty((n_rows + 3, n_cols), dtype=object)
+
+    meta = sorted(QUALTRICS_METADATA_IDS)
+    qids = [m[0].upper() + m[1:] for m in meta] + ["Q2"] + [f"Q{i + 10}" for i in range(n_questions)]
+    texts = [f"Meta text {i}" for i in range(17)] + ["Record ID"] + [f"Question text {i}" for i in range(n_questions)]
+    import_ids = meta + ["QID2_TEXT"] + [f"QID{i + 10}" for i in range(n_questions)]
+    for raw in (values, labels):
+        raw[0, :] = qids
+        raw[1, :] = texts
+        raw[2, :] = ['{"ImportId":"%s"}' % i for i in import_ids]
+        raw[3:, :17] = "meta"
+        raw[3:, 17] = np.char.zfill(np.arange(n_rows).astype(str), 6).astype(object)
+
+    values[3:, 18:] = (codes + 1).astype(str).astype(object)
+    labels[3:, 18:] = LIKERT[codes]
+
+    # Sprinkle some missing answers
+    missing = rng.random((n_rows, n_questions)) < 0.02
+    values[3:, 18:][missing] = np.nan
+    labels[3:, 18:][missing] = np.nan
+
+    values_path = os.path.join(directory, "values.csv")
+    labels_path = os.path.join(directory, "labels.csv")
+    pd.DataFrame(values).to_csv(values_path, header=False, index=False)
+    pd.DataFrame(labels).to_csv(labels_path, header=False, index=False)
+
+    headers = ["RecordID"] + [f"{q}. {t}" for q, t in zip(qids[18:], texts[18:])]
+    return values_path, labels_path, headers
+
+def make_raw_exports(n_rows, n_questions, seed=0):
+    """
+    Builds a synthetic export pair as it looks after pd.read_csv(header=None, dtype=str),
+    round-tripped through CSV so the blocks have the dtypes process_survey_data sees.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        values_path, labels_path, headers = write_raw_exports(tmp, n_rows, n_questions, seed)
+        df_values = pd.read_csv(values_path, header=None, dtype=str)
+        df_labels = pd.read_csv(labels_path, header=None, dtype=str)
+    return df_values, df_labels, headers
+
+def legacy_merge(df_values, df_labels, new_headers):
+    """The column-at-a-time merge loop that process_survey_data used before the block kernel."""
+    data_values = df_values.iloc[3:, 17:].reset_index(drop=True)
+    data_labels = df_labels.iloc[3:, 17:].reset_index(drop=True)
+    merged_data = pd.DataFrame()
+    for i, header in enumerate(new_headers):
+        col_val = data_values.iloc[:, i].astype(str).str.strip()
+        col_lab = data_labels.iloc[:, i].astype(str).str.strip()
+        col_val = col_val.replace('nan', '')
+        col_lab = col_lab.replace('nan', '')
+        if header == "RecordID":
+            col_val = col_val.astype(str).str.strip().replace('nan', '')
+        else:
+            col_val = pd.to_numeric(col_val, errors='coerce').astype('Int64')
+        merged_data[f"{header} (Value)"] = col_val
+        merged_data[f"{header} (Label)"] = col_lab
+    return merged_data
+
+def main():
+    parser = argparse.ArgumentParser(description="Before/after benchmark of the Value/Label merge kernel.")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--questions", type=int, default=1500)
+    parser.add_argument("--skip-legacy", action="store_true", help="Only time the block kernel.")
+    args = parser.parse_args()
+
+    print(f"Building synthetic export: {args.rows} rows x {args.questions} questions...")
+    df_values, df_labels, headers = make_raw_exports(args.rows, args.questions)
+
+    start = time.perf_counter()
+    merged = _merge_blocks(df_values.iloc[3:, 17:], df_labels.iloc[3:, 17:], headers)
+    new_time = time.perf_counter() - start
+    print(f"Block kernel:  {new_time:8.2f}s  -> {merged.shape}")
+
+    if not args.skip_legacy:
+        start = time.perf_counter()
+        legacy = legacy_merge(df_values, df_labels, headers)
+        old_time = time.perf_counter() - start
+        print(f"Legacy loop:   {old_time:8.2f}s  -> {legacy.shape}")
+        print(f"Speedup:       {old_time / new_time:8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import argparse
+import os
+import tempfile
+import time
+from benchmark_merge import write_raw_exports
+from pipeline import DatasetJob, run_datasets, build_export
+
+EXPORT_KINDS = ['xlsx', 'docx', 'spss_csv', 'sav']
+
+def run_sequential(jobs, exports):
+    """The old app flow: parse, merge and export pre, then the same for post."""
+    results = run_datasets(jobs[:1], exports, max_workers=1)
+    results.update(run_datasets(jobs[1:], exports, max_workers=1))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequential vs concurrent pre/post processing.")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--questions", type=int, default=300)
+    parser.add_argument("--exports", nargs="*", default=EXPORT_KINDS)
+    parser.add_argument("--workers", type=int, default=None, help="Pool size (default: one per CPU).")
+    args = parser.parse_args()
+
+    print(f"Two synthetic datasets of {args.rows} rows x {args.questions} questions, {os.cpu_count()} CPUs")
+    with tempfile.TemporaryDirectory() as tmp:
+        jobs = []
+        for i, name in enumerate(["pre", "post"]):
+            directory = os.path.join(tmp, name)
+            os.mkdir(directory)
+            values_path, labels_path, _ = write_raw_exports(directory, args.rows, args.questions, seed=i)
+            jobs.append(DatasetJob(name, values_path, labels_path))
+
+        start = time.perf_counter()
+        sequential = run_sequential(jobs, args.exports)
+        sequential_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        concurrent = run_datasets(jobs, args.exports, max_workers=args.workers)
+        concurrent_time = time.perf_counter() - start
+
+    for name, result in concurrent.items():
+        same = result.artifacts.get('spss_csv') == sequential[name].artifacts.get('spss_csv')
+        print(f"{name}: ok={result.ok} exports={sorted(result.artifacts)} spss_csv identical={same}")
+    print(f"Sequential: {sequential_time:8.2f}s")
+    print(f"Concurrent: {concurrent_time:8.2f}s  ({sequential_time / concurrent_time:.2f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from synthetic import write_qualtrics_exports
+from processing import process_survey_data, generate_docx_dictionary, clean_for_spss, write_merged_excel
+
+# Size tiers: synthetic export shapes (single-choice questions; every tier also has
+# 2 five-item matrices, one 8-option multi-select and one free-text question)
+TIERS = {
+    'small': {'rows': 1000, 'questions': 40},
+    'medium': {'rows': 10000, 'questions': 150},
+    'large': {'rows': 50000, 'questions': 300},
+}
+# Local file (not committed): baselines only mean something on the machine that recorded them
+DEFAULT_BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baselines.json")
+# A step only counts as a regression if it is both this much slower, relatively ...
+DEFAULT_THRESHOLD = 0.25
+# ... and this many seconds slower, so timer noise on tiny steps is ignored
+MIN_REGRESSION_SECONDS = 0.05
+
+def _best_of(repeat, func):
+    """Runs func repeat times; returns (fastest wall time, last result)."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+def reference_seconds(repeat=3):
+    """
+    Time of a fixed workload that uses none of this repo's code (a NumPy sort, a pandas
+    factorize/groupby and a pure-Python string loop), run next to the steps. Timings are
+    stored and compared as multiples of it, so a slower or busier machine scales both
+    sides instead of showing up as a regression.
+    """
+    rng = np.random.default_rng(0)
+    numbers = rng.integers(0, 1000, 2_000_000)
+    words = pd.Series(rng.choice(["agree", "disagree", "neutral", "n/a"], 500_000))
+
+    def workload():
+        np.sort(numbers)
+        codes, _ = pd.factorize(words)
+        pd.Series(numbers[:len(codes)]).groupby(codes).mean()
+        return sum(len(f"{n}-{n % 7}") for n in range(300_000))
+
+    seconds, _ = _best_of(repeat, workload)
+    return seconds
+
+def run_tier(tier, repeat=3):
+    """
+    Times each pipeline step on a synthetic export of the given tier.
+
+    Returns:
+        dict: {step: seconds} for process_survey_data, generate_docx_dictionary,
+        clean_for_spss and write_merged_excel (the fastest of repeat runs each).
+    """
+    shape = TIERS[tier]
+    with tempfile.TemporaryDirectory() as tmp:
+        export = write_qualtrics_exports(tmp, shape['rows'], shape['questions'])
+        results = {}
+        results['process_survey_data'], (df, codebook) = _best_of(repeat, lambda: process_survey_data(
+            export.values_path, export.labels_path, 'pre', export.unique_id_col, return_codebook=True))
+    results['generate_docx_dictionary'], _ = _best_of(repeat, lambda: generate_docx_dictionary(df, codebook))
+    results['clean_for_spss'], _ = _best_of(repeat, lambda: clean_for_spss(df, 'pre', codebook))
+    results['write_merged_excel'], _ = _best_of(repeat, lambda: write_merged_excel(df, io.BytesIO()))
+    return results
+
+def machine_info():
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def compare(results, baselines, reference, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares timings against stored baselines. Baselines are multiples of the reference
+    workload (see reference_seconds), so they are scaled by this run's reference first.
+
+    Returns:
+        pd.DataFrame: Tier, Step, Baseline (scaled to this machine), Current, Ratio and
+        Status ('ok', 'faster', 'REGRESSION' or 'new' for steps without a baseline).
+    """
+    rows = []
+    for tier, steps in results.items():
+        for step, seconds in steps.items():
+            relative = (baselines or {}).get('tiers', {}).get(tier, {}).get(step)
+            if relative is None:
+                rows.append((tier, step, None, seconds, None, "new"))
+                continue
+            baseline = relative * reference
+            ratio = seconds / baseline if baseline else float('inf')
+            if ratio > 1 + threshold and seconds - baseline > MIN_REGRESSION_SECONDS:
+                status = "REGRESSION"
+            elif ratio < 1 / (1 + threshold):
+                status = "faster"
+            else:
+                status = "ok"
+            rows.append((tier, step, baseline, seconds, ratio, status))
+    return pd.DataFrame(rows, columns=["Tier", "Step", "Baseline", "Current", "Ratio", "Status"])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scaling benchmark of the merge, dictionary, SPSS and Excel steps with a regression check.")
+    parser.add_argument("--tiers", nargs="+", default=['small', 'medium'], choices=list(TIERS), help="Size tiers to run.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per step; the fastest counts.")
+    parser.add_argument("--baselines", default=DEFAULT_BASELINES, help="Baseline JSON file.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown before a step counts as a regression (0.25 = 25%%).")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run's timings (relative to the reference workload) as the local baselines for its tiers.")
+    args = parser.parse_args(argv)
+
+    reference = reference_seconds(args.repeat)
+    print(f"Reference workload: {reference:.3f}s")
+    results = {}
+    for tier in args.tiers:
+        print(f"Running tier '{tier}' ({TIERS[tier]['rows']} rows x {TIERS[tier]['questions']} questions)...")
+        results[tier] = run_tier(tier, args.repeat)
+
+    baselines = load_baselines(args.baselines)
+    if baselines and baselines.get('machine') != machine_info():
+        print(f"WARNING: Baselines were recorded on a different setup ({baselines.get('machine')}). "
+              "They are scaled by the reference workload, but re-record them with --save-baseline "
+              "for a dependable comparison.")
+    report = compare(results, baselines, reference, args.threshold)
+    print()
+    print(report.to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+
+    if args.save_baseline:
+        stored = baselines or {}
+        stored['machine'] = machine_info()
+        stored['reference_seconds'] = reference
+        for tier, steps in results.items():
+            stored.setdefault('tiers', {})[tier] = {step: seconds / reference for step, seconds in steps.items()}
+        with open(args.baselines, 'w', encoding='utf-8') as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+        print(f"\nSaved baselines for {', '.join(results)} to {args.baselines}")
+        return 0
+
+    regressions = report[report["Status"] == "REGRESSION"]
+    if len(regressions):
+        print(f"\n{len(regressions)} step(s) slower than baseline by more than {args.threshold:.0%}.")
+        return 1
+    print("\nNo regressions.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+import argparse
+import numpy as np
+import pandas as pd
+from record_index import normalize_ids
+
+class CellIndex:
+    """
+    Inverted index of every cell of a frame: normalized cell value -> (row, column)
+    positions, so any number of values can be looked up without rescanning the cells.
+
+    Built in one vectorized pass: each column is factorized, the distinct values of all
+    columns are normalized together (see normalize_ids: whitespace, '1046.0', leading
+    zeros, numbers vs text) and each column's rows are grouped by one stable sort of its
+    integer codes. Blank and missing cells are not indexed.
+
+    Rows and columns are 0-based positions (df.iloc); for a raw export read with
+    header=None the row is the line of the file.
+    """
+
+    def __init__(self, df):
+        self.columns = df.columns
+        self.shape = df.shape
+        # 1. Factorize every column; group its rows by code (missing cells, code -1, sort first)
+        self._raw_uniques, self._order, self._offsets = [], [], []
+        for j in range(df.shape[1]):
+            codes, uniques = pd.factorize(df.iloc[:, j])
+            order = np.argsort(codes, kind='stable').astype(np.int32 if len(codes) < 2**31 else np.intp)
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            self._raw_uniques.append(np.asarray(uniques, dtype=object))
+            self._order.append(order)
+            self._offsets.append(np.concatenate([[0], np.cumsum(counts)]) + (len(codes) - counts.sum()))
+
+        # 2. Normalize the distinct values of all columns at once and give each a global code
+        owners = np.repeat(np.arange(df.shape[1]), [len(u) for u in self._raw_uniques])
+        local = np.concatenate([np.arange(len(u)) for u in self._raw_uniques]) if len(owners) else owners
+        raw = pd.Series(np.concatenate(self._raw_uniques) if len(owners) else [], dtype=object)
+        keys, self._keys = pd.factorize(normalize_ids(raw))
+
+        # 3. Global code -> the (column, local code) pairs holding that value
+        present = keys >= 0
+        by_key = np.argsort(keys[present], kind='stable')
+        self._entries = np.stack([owners[present][by_key], local[present][by_key]], axis=1)
+        self._entry_offsets = np.concatenate([[0], np.cumsum(np.bincount(keys[present], minlength=len(self._keys)))])
+        self._lookup = {key: i for i, key in enumerate(self._keys)}
+
+    @classmethod
+    def from_csv(cls, path):
+        """Indexes a CSV as raw text (header rows included), like the export files on disk."""
+        return cls(pd.read_csv(path, header=None, dtype=str, keep_default_na=False))
+
+    def __len__(self):
+        """Number of distinct normalized values."""
+        return len(self._keys)
+
+    def __contains__(self, value):
+        return normalize_ids([value]).iloc[0] in self._lookup
+
+    def find(self, value):
+        """
+        Cells equal to value after normalization.
+
+        Returns:
+            pd.DataFrame: Row, Column (label), Column Position and Value (the cell as
+            stored), in column order, then row order.
+        """
+        return self.search([value]).drop(columns="Target")
+
+    def search(self, values):
+        """
+        Cells matching any of several values (one lookup per value, no rescans).
+
+        Returns:
+            pd.DataFrame: Target, Row, Column, Column Position and Value for every match;
+            targets that are not found have no rows.
+        """
+        targets = list(values)
+        keys = normalize_ids(targets)
+        parts = []
+        for target, key in zip(targets, keys):
+            i = self._lookup.get(key)
+            if i is None:
+                continue
+            for j, code in self._entries[self._entry_offsets[i]:self._entry_offsets[i + 1]]:
+                rows = self._order[j][self._offsets[j][code]:self._offsets[j][code + 1]]
+                parts.append((target, rows, j, self._raw_uniques[j][code]))
+        return pd.DataFrame({
+            "Target": [target for target, rows, _, _ in parts for _ in rows],
+            "Row": np.concatenate([rows for _, rows, _, _ in parts]) if parts else np.array([], dtype=int),
+            "Column": [self.columns[j] for _, rows, j, _ in parts for _ in rows],
+            "Column Position": [j for _, rows, j, _ in parts for _ in rows],
+            "Value": [value for _, rows, _, value in parts for _ in rows],
+        })
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find values (e.g. respondent IDs) anywhere in CSV exports.")
+    parser.add_argument("files", nargs="+", help="CSV files to search (read as raw text, header rows included).")
+    parser.add_argument("-f", "--find", nargs="+", required=True, help="Values to look for.")
+    args = parser.parse_args(argv)
+
+    for path in args.files:
+        print(f"\n--- {path} ---")
+        matches = CellIndex.from_csv(path).search(args.find)
+        for target in args.find:
+            found = matches[matches["Target"] == target]
+            if found.empty:
+                print(f"  '{target}' NOT FOUND.")
+                continue
+            print(f"  FOUND '{target}' at:")
+            for row, col, value in zip(found["Row"], found["Column Position"], found["Value"]):
+                print(f"    Row: {row}, Col: {col} (Value: '{value}')")
+
+if __name__ == "__main__":
+    main()
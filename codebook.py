@@ -0,0 +1,208 @@
+import re
+from dataclasses import dataclass, field
+
+# A question is open-ended (free text, IDs) when at least this many distinct answers were
+# given and they make up more than this share of its answered rows; choice lists stay below
+OPEN_ENDED_MIN_DISTINCT = 50
+OPEN_ENDED_RATIO = 0.5
+
+def is_open_ended(n_distinct, n_answered):
+    """Cardinality test for free-text and ID columns (see OPEN_ENDED_MIN_DISTINCT)."""
+    return n_distinct >= OPEN_ENDED_MIN_DISTINCT and n_distinct > n_answered * OPEN_ENDED_RATIO
+
+@dataclass
+class CodebookEntry:
+    """
+    One question of a merged survey: where it lives in the merged frame and its answer options.
+
+    Attributes:
+        header: Composite header used in the merged frame ("Q1. Question Text" or "RecordID").
+        qid: Qualtrics QID from header row 1 (e.g. "Q1", "Q5_1", "Q22").
+        text: Question text from header row 2.
+        import_id: ImportId from header row 3 (e.g. "QID5_TEXT"), if the export has one.
+        has_value: Whether the merged frame has a "<header> (Value)" column.
+        has_label: Whether the merged frame has a "<header> (Label)" column.
+        open_ended: Free-text or ID question (a "_TEXT" ImportId, the RecordID, or too many
+            distinct answers, see is_open_ended). Its answers are not collected as
+            value/label pairs and the data dictionary does not tabulate them.
+    """
+    header: str
+    qid: str
+    text: str = ""
+    import_id: str = None
+    has_value: bool = True
+    has_label: bool = True
+    open_ended: bool = False
+    # (value, label) -> None, kept in first-seen order so chunks can be merged in
+    _pairs: dict = field(default_factory=dict, repr=False)
+
+    @property
+    def value_column(self):
+        return f"{self.header} (Value)" if self.has_value else None
+
+    @property
+    def label_column(self):
+        return f"{self.header} (Label)" if self.has_label else None
+
+    def add_pairs(self, pairs):
+        """Records observed (value, label) pairs; repeats are ignored."""
+        self._pairs.update(dict.fromkeys(pairs))
+
+    @property
+    def pairs(self):
+        """
+        Distinct (value, label) pairs sorted by value - numerically when every value
+        is a number, as text otherwise. A value seen with several labels appears once per label.
+        """
+        pairs = list(self._pairs)
+        try:
+            keys = [float(value) for value, _ in pairs]
+        except (TypeError, ValueError):
+            keys = [str(value) for value, _ in pairs]
+        order = sorted(range(len(pairs)), key=keys.__getitem__)
+        return [pairs[i] for i in order]
+
+    @property
+    def value_labels(self):
+        """Sorted value -> label map (the first label seen wins when a value has several)."""
+        mapping = {}
+        for value, label in self.pairs:
+            mapping.setdefault(value, label)
+        return mapping
+
+    @property
+    def value_conflicts(self):
+        """Values that were recorded with more than one label."""
+        seen = {}
+        for value, label in self.pairs:
+            seen.setdefault(value, set()).add(label)
+        return [value for value, labels in seen.items() if len(labels) > 1]
+
+    @property
+    def label_conflicts(self):
+        """Labels that were recorded for more than one value."""
+        seen = {}
+        for value, label in self.pairs:
+            seen.setdefault(label, set()).add(value)
+        return [label for label, values in seen.items() if len(values) > 1]
+
+    @property
+    def has_conflicts(self):
+        return bool(self.value_conflicts or self.label_conflicts)
+
+@dataclass
+class Codebook:
+    """
+    Per-question metadata for a merged survey, built once by process_survey_data so the
+    dictionary and SPSS export do not have to re-scan the merged DataFrame.
+    """
+    entries: list = field(default_factory=list)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def headers(self):
+        return [entry.header for entry in self.entries]
+
+    def get(self, header):
+        """Returns the entry for a composite header, or None."""
+        for entry in self.entries:
+            if entry.header == header:
+                return entry
+        return None
+
+    def to_dict(self):
+        """Plain JSON-serializable form (see from_dict), e.g. for the result cache."""
+        return {'entries': [{
+            'header': entry.header, 'qid': entry.qid, 'text': entry.text, 'import_id': entry.import_id,
+            'has_value': entry.has_value, 'has_label': entry.has_label, 'open_ended': entry.open_ended,
+            'pairs': [list(pair) for pair in entry._pairs],
+        } for entry in self.entries]}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuilds a Codebook saved with to_dict; pairs keep their first-seen order."""
+        codebook = cls()
+        for fields in data['entries']:
+            fields = dict(fields)
+            pairs = fields.pop('pairs')
+            entry = CodebookEntry(**fields)
+            entry.add_pairs(tuple(pair) for pair in pairs)
+            codebook.entries.append(entry)
+        return codebook
+
+    @classmethod
+    def from_columns(cls, columns):
+        """
+        Rebuilds the question layout (no answer pairs) from merged column names, e.g.
+        for a merged XLSX that was uploaded again.
+
+        Args:
+            columns: Column names such as "Q1. Question Text (Value)" / "... (Label)".
+
+        Returns:
+            Codebook: One entry per question, in column order.
+        """
+        codebook = cls()
+        by_header = {}
+        for col in columns:
+            col = str(col)
+            if col.endswith(" (Value)"):
+                base, is_value = col[:-len(" (Value)")], True
+            elif col.endswith(" (Label)"):
+                base, is_value = col[:-len(" (Label)")], False
+            else:
+                continue
+
+            entry = by_header.get(base)
+            if entry is None:
+                if base == "RecordID":
+                    qid, text = "RecordID", ""
+                else:
+                    qid, _, text = base.partition(". ")
+                entry = CodebookEntry(header=base, qid=qid, text=text, has_value=False, has_label=False)
+                by_header[base] = entry
+                codebook.entries.append(entry)
+            if is_value:
+                entry.has_value = True
+            else:
+                entry.has_label = True
+        return codebook
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """
+        Builds a full Codebook by scanning a merged DataFrame that has none attached.
+
+        This is the slow path (one pass over the rows per question); frames coming from
+        process_survey_data should use the Codebook it returns instead.
+        """
+        codebook = cls.from_columns(df.columns)
+        for entry in codebook:
+            if not entry.has_label:
+                continue
+            labels = df[entry.label_column]
+            answered = labels[labels.notna() & (labels != '')]
+            # Text-entry questions are merged without a Value column
+            entry.open_ended = (entry.header == "RecordID" or not entry.has_value
+                                or is_open_ended(answered.nunique(), len(answered)))
+            if entry.open_ended:
+                continue
+            pairs = df[[entry.value_column, entry.label_column]].drop_duplicates().dropna()
+            # Blank text values are missing values too, as in process_survey_data
+            entry.add_pairs(pair for pair in pairs.itertuples(index=False, name=None) if pair[0] != '')
+        return codebook
+
+def spss_name(entry, prefix):
+    """
+    SPSS variable name for a question ("{prefix}_{Qnumber}", e.g. pre_Q1), or None for
+    columns without a Qx style QID, which are passed through unchanged.
+    """
+    match = re.match(r"^(Q[\d_]+)", entry.qid)
+    if match:
+        return f"{prefix}_{match.group(1)}"
+    return None
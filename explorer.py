@@ -0,0 +1,188 @@
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from codebook import Codebook
+from record_index import RecordIndex
+
+# "Q3=4..5" (4 to 5), "Q3=4.." (4 or more), "Q3=..5" (5 or less) or "Q3=2" (exactly 2)
+_RANGE = re.compile(r"^([^=\s]+)\s*=\s*(-?\d+(?:\.\d+)?)?\s*(\.\.)?\s*(-?\d+(?:\.\d+)?)?$")
+SHOW_OPTIONS = ('both', 'values', 'labels')
+# Filtered views kept per explorer, so paging through one does not re-run its filters
+MAX_CACHED_VIEWS = 8
+
+def parse_ranges(text):
+    """
+    Parses value filters typed as "Q3=4..5, Q7=2, Q9=..3" (comma-separated).
+
+    Returns:
+        dict: {qid: (low, high)}; an open end is None.
+
+    Raises:
+        ValueError: If a filter is not of the form QID=low..high, QID=low.., QID=..high or QID=value.
+    """
+    ranges = {}
+    for part in (text or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        match = _RANGE.match(part)
+        if not match or (match.group(2) is None and match.group(4) is None):
+            raise ValueError(f"Invalid value filter '{part}'. Use e.g. Q3=4..5, Q3=4.., Q3=..5 or Q3=2.")
+        qid, low, dots, high = match.groups()
+        low = float(low) if low is not None else None
+        high = float(high) if high is not None else None
+        ranges[qid] = (low, high) if dots else (low, low)
+    return ranges
+
+def parse_list(text):
+    """Splits comma-separated input ("Q1, Q5" or "1046, 1019") into its non-empty items."""
+    return [item.strip() for item in (text or "").split(",") if item.strip()]
+
+@dataclass
+class ExplorerView:
+    """
+    One filtered view of a merged frame: the matching row positions and the chosen
+    columns. Nothing is copied until a page is taken.
+
+    Attributes:
+        df: The merged frame.
+        rows: 0-based positions of the matching rows, in file order.
+        columns: Column names shown, in merged order.
+    """
+    df: pd.DataFrame
+    rows: np.ndarray
+    columns: list
+
+    def __len__(self):
+        return len(self.rows)
+
+    def n_pages(self, page_size=100):
+        return max(1, -(-len(self.rows) // page_size))
+
+    def page(self, number=1, page_size=100):
+        """
+        Rows of one page (1-based; clamped to the last page) as a small DataFrame, indexed
+        by their row positions in the merged frame.
+        """
+        number = min(max(1, number), self.n_pages(page_size))
+        rows = self.rows[(number - 1) * page_size:number * page_size]
+        page = self.df.iloc[rows, self.df.columns.get_indexer(self.columns)]
+        page.index = pd.Index(rows, name="Row")
+        return page
+
+class DatasetExplorer:
+    """
+    Server-side filtering and paging over a merged frame: a view is computed from
+    integer positions (RecordID lookups through the RecordIndex, value ranges as
+    vectorized comparisons) and only the requested page is materialized, so a page of
+    a 100k-row, 2k-column dataset costs the same as one of a small survey.
+    """
+
+    def __init__(self, df, codebook=None, record_index=None):
+        self.df = df
+        self.codebook = codebook if codebook is not None else Codebook.from_columns(df.columns)
+        self.record_index = record_index
+        self._views = OrderedDict()
+
+    def _entries(self, qid):
+        """Entries of a QID: the question itself or, for a block parent (Q5), all of Q5_1, Q5_2, ..."""
+        key = qid.strip().lower()
+        return [entry for entry in self.codebook
+                if entry.qid.lower() == key or entry.qid.lower().startswith(key + "_")]
+
+    def columns_for(self, qids=None, show='both'):
+        """
+        Column names for a QID subset (all questions when qids is empty); the RecordID
+        columns always come first.
+
+        Args:
+            qids: QIDs or block parents ("Q1", "Q5" for Q5_1, Q5_2, ...). RecordID is also accepted.
+            show: 'both', 'values' or 'labels' - which half of each Value/Label pair to keep.
+
+        Raises:
+            ValueError: If a QID matches no question or show is unknown.
+        """
+        if show not in SHOW_OPTIONS:
+            raise ValueError(f"Unknown show option '{show}'. Expected one of {SHOW_OPTIONS}.")
+        if qids:
+            selected = set()
+            for qid in qids:
+                entries = self._entries(qid)
+                if not entries:
+                    raise ValueError(f"No question with QID '{qid}'.")
+                selected.update(entry.header for entry in entries)
+        else:
+            selected = None
+
+        columns = []
+        for entry in self.codebook:
+            if entry.header != "RecordID" and selected is not None and entry.header not in selected:
+                continue
+            if entry.has_value and show != 'labels':
+                columns.append(entry.value_column)
+            # A question without a Value column (free text) still shows its text with show='values'
+            if entry.has_label and (show != 'values' or not entry.has_value):
+                columns.append(entry.label_column)
+        return [col for col in columns if col in self.df.columns]
+
+    def _value_column(self, qid):
+        entries = [entry for entry in self.codebook if entry.qid.lower() == qid.strip().lower()]
+        if not entries or not entries[0].has_value:
+            raise ValueError(f"No numeric question with QID '{qid}' to filter on.")
+        column = entries[0].value_column
+        if not pd.api.types.is_numeric_dtype(self.df[column]):
+            raise ValueError(f"Question '{qid}' has no numeric values to filter on.")
+        return column
+
+    def filter_rows(self, record_ids=None, ranges=None):
+        """
+        Row positions matching every filter.
+
+        Args:
+            record_ids: RecordIDs to keep, matched after normalization (see RecordIndex).
+            ranges: {qid: (low, high)} inclusive value ranges (None = open end); rows
+                without a value for that question do not match.
+
+        Returns:
+            np.ndarray: Sorted 0-based row positions.
+        """
+        mask = np.ones(len(self.df), dtype=bool)
+        for qid, (low, high) in (ranges or {}).items():
+            values = self.df[self._value_column(qid)].to_numpy(dtype='float64', na_value=np.nan)
+            # NaN compares False, so missing answers drop out
+            in_range = ~np.isnan(values)
+            if low is not None:
+                in_range &= values >= low
+            if high is not None:
+                in_range &= values <= high
+            mask &= in_range
+
+        if record_ids:
+            if self.record_index is None:
+                self.record_index = RecordIndex.from_frame(self.df)
+            found = np.zeros(len(self.df), dtype=bool)
+            for positions in self.record_index.lookup(record_ids).values():
+                found[positions] = True
+            mask &= found
+        return np.flatnonzero(mask)
+
+    def query(self, qids=None, record_ids=None, ranges=None, show='both'):
+        """
+        Filtered view for the given column subset and row filters (see columns_for and
+        filter_rows). The last MAX_CACHED_VIEWS views are kept, so paging re-uses them.
+
+        Returns:
+            ExplorerView: Matching rows and shown columns; take pages with view.page().
+        """
+        key = (tuple(qids or ()), tuple(record_ids or ()), tuple(sorted((ranges or {}).items())), show)
+        view = self._views.get(key)
+        if view is None:
+            view = ExplorerView(self.df, self.filter_rows(record_ids, ranges), self.columns_for(qids, show))
+            self._views[key] = view
+            if len(self._views) > MAX_CACHED_VIEWS:
+                self._views.popitem(last=False)
+        else:
+            self._views.move_to_end(key)
+        return view
@@ -1,5 +1,14 @@
 import pandas as pd
 import os
+from cell_index import CellIndex
+
+def report_matches(matches, targets):
+    for t in targets:
+        found = matches[matches["Target"] == t]
+        for r, col, value in zip(found["Row"], found["Column Position"], found["Value"]):
+            print(f"  FOUND '{t}' at Row {r}, Col {col} (Value: '{value}')")
+        if found.empty:
+            print(f"  '{t}' NOT FOUND anywhere.")
 
 def find_specific_values():
     cwd = os.getcwd()
@@ -26,21 +35,10 @@ def find_specific_values():
             df = pd.read_csv(pre_path, header=None)
             targets = ['1046', '1019']
             
-            # 1. Search everywhere
+            # 1. Search everywhere (one indexing pass, then a lookup per target;
+            # matches ignore whitespace, leading zeros and 1046 vs 1046.0)
             print(f"Searching for {targets} in ENTIRE file...")
-            for t in targets:
-                found_count = 0
-                for col in df.columns:
-                    # usage of astype(str) to catch numeric or string types
-                    matches = df[col].astype(str).str.strip().eq(t)
-                    if matches.any():
-                        rows = matches.index[matches].tolist()
-                        for r in rows:
-                            # Adjust row index for header (data starts at row 3 usually, but we read all)
-                            print(f"  FOUND '{t}' at Row {r}, Col {col} (Value: '{df.iloc[r, col]}')")
-                            found_count += 1
-                if found_count == 0:
-                    print(f"  '{t}' NOT FOUND anywhere.")
+            report_matches(CellIndex.from_csv(pre_path).search(targets), targets)
 
             # 2. Check "RecordID" column specifically (assuming Q22)
             # We need to find which column is Q22.
@@ -75,21 +73,10 @@ def find_specific_values():
     if os.path.exists(post_path):
         print(f"\n--- Scanning Post-Survey: {post_path} ---")
         try:
-            df = pd.read_csv(post_path, header=None)
             targets = ['1023', '1011']
             
             print(f"Searching for {targets} in ENTIRE file...")
-            for t in targets:
-                found_count = 0
-                for col in df.columns:
-                    matches = df[col].astype(str).str.strip().eq(t)
-                    if matches.any():
-                        rows = matches.index[matches].tolist()
-                        for r in rows:
-                            print(f"  FOUND '{t}' at Row {r}, Col {col} (Value: '{df.iloc[r, col]}')")
-                            found_count += 1
-                if found_count == 0:
-                    print(f"  '{t}' NOT FOUND anywhere.")
+            report_matches(CellIndex.from_csv(post_path).search(targets), targets)
                     
         except Exception as e:
             print(f"Error reading Post CSV: {e}")
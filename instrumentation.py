@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+logger = logging.getLogger("data_union")
+# Level of the stage log lines when configure_logging is called without one
+LOG_LEVEL_ENV = "DATA_UNION_LOG_LEVEL"
+
+def configure_logging(level=None):
+    """
+    Sends the "data_union" log lines (one JSON line per stage, see stage()) to stderr,
+    which the hosted app's logs capture. Safe to call on every Streamlit rerun: the
+    handler is only added once.
+
+    Args:
+        level: Logging level name or number. Defaults to the DATA_UNION_LOG_LEVEL
+            environment variable, or INFO.
+
+    Raises:
+        ValueError: If the level name is unknown.
+    """
+    level = level or os.environ.get(LOG_LEVEL_ENV) or "INFO"
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        # Not passed on to the root logger as well, so no line is printed twice
+        logger.propagate = False
+    return logger
+
+@dataclass
+class StageStats:
+    """
+    Measurements of one pipeline stage.
+
+    Attributes:
+        name: Stage name ('header', 'parse', 'validation', 'merge', 'serialize (xlsx)', ...).
+        dataset: Dataset the stage ran for ('pre', 'post').
+        seconds: Wall time.
+        peak_bytes: Peak memory allocated during the stage above what was in use when it
+            started (Python and NumPy/pandas allocations, via tracemalloc), or None
+            when memory is not traced.
+        arrow_bytes: Growth of pyarrow's memory pool over the stage (buffers the stage
+            left allocated, e.g. parsed CSV columns), which tracemalloc cannot see; None
+            when memory is not traced.
+        rows / cols: Size of the data the stage produced or handled.
+    """
+    name: str
+    dataset: str = None
+    seconds: float = 0.0
+    peak_bytes: int = None
+    arrow_bytes: int = None
+    rows: int = None
+    cols: int = None
+
+@dataclass
+class PipelineReport:
+    """
+    Per-stage timings of one or more datasets. Stages with the same name and dataset are
+    combined (times added, peaks and sizes maxed), e.g. the chunks of a streamed merge.
+
+    Attributes:
+        trace_memory: Also record peak memory. tracemalloc slows allocation-heavy steps
+            down and is process-wide, so concurrent stages see each other's allocations.
+        stages: StageStats in the order the stages first ran.
+    """
+    trace_memory: bool = False
+    stages: list = field(default_factory=list)
+
+    def add(self, stats):
+        for existing in self.stages:
+            if (existing.name, existing.dataset) == (stats.name, stats.dataset):
+                existing.seconds += stats.seconds
+                if stats.arrow_bytes is not None:
+                    existing.arrow_bytes = (existing.arrow_bytes or 0) + stats.arrow_bytes
+                for attr in ('peak_bytes', 'rows', 'cols'):
+                    values = [v for v in (getattr(existing, attr), getattr(stats, attr)) if v is not None]
+                    setattr(existing, attr, max(values) if values else None)
+                return existing
+        self.stages.append(stats)
+        return stats
+
+    def extend(self, other):
+        """Adds the stages of another report (e.g. a dataset's report into a batch report)."""
+        for stats in other.stages:
+            self.add(StageStats(**asdict(stats)))
+
+    @property
+    def total_seconds(self):
+        return sum(stats.seconds for stats in self.stages)
+
+    def to_frame(self):
+        """One row per stage: Dataset, Stage, Seconds, Peak MB, Arrow MB, Rows, Columns, Rows/s."""
+        frame = pd.DataFrame({
+            "Dataset": [s.dataset for s in self.stages],
+            "Stage": [s.name for s in self.stages],
+            "Seconds": [round(s.seconds, 4) for s in self.stages],
+            "Peak MB": [None if s.peak_bytes is None else round(s.peak_bytes / 1e6, 2) for s in self.stages],
+            "Arrow MB": [None if s.arrow_bytes is None else round(s.arrow_bytes / 1e6, 2) for s in self.stages],
+            "Rows": pd.array([s.rows for s in self.stages], dtype='Int64'),
+            "Columns": pd.array([s.cols for s in self.stages], dtype='Int64'),
+        })
+        frame["Rows/s"] = (frame["Rows"] / frame["Seconds"].where(frame["Seconds"] > 0)).round(0)
+        return frame
+
+@contextmanager
+def stage(report, name, dataset=None):
+    """
+    Times the enclosed block as one stage of report and logs it as a JSON line
+    (logger "data_union", level INFO). The yielded StageStats can be given rows/cols
+    inside the block. With report=None nothing is measured or recorded.
+
+    Example:
+        with stage(report, 'parse', 'pre') as stats:
+            df = read(...)
+            stats.rows, stats.cols = df.shape
+    """
+    stats = StageStats(name, dataset)
+    if report is None:
+        yield stats
+        return
+
+    started_tracing = False
+    if report.trace_memory:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+        baseline = tracemalloc.get_traced_memory()[0]
+        arrow_baseline = pa.total_allocated_bytes() if pa is not None else 0
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        stats.seconds = time.perf_counter() - start
+        if report.trace_memory:
+            stats.peak_bytes = max(0, tracemalloc.get_traced_memory()[1] - baseline)
+            if pa is not None:
+                stats.arrow_bytes = pa.total_allocated_bytes() - arrow_baseline
+            if started_tracing:
+                tracemalloc.stop()
+        report.add(stats)
+        logger.info(json.dumps({"event": "stage", **asdict(stats)}))
+
+@contextmanager
+def memory_tracing(enabled=True):
+    """
+    Keeps tracemalloc running for the enclosed block, so stages that run concurrently
+    (e.g. on the pipeline's thread pool) do not start and stop it under each other.
+    """
+    started = enabled and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        yield
+    finally:
+        if started:
+            tracemalloc.stop()
@@ -1,5 +1,5 @@
 import os
-import pandas as pd
+from cell_index import CellIndex
 
 def locate_and_search():
     print(f"Propagating from: {os.getcwd()}")
@@ -24,17 +24,16 @@ def locate_and_search():
     # 2. Search for Duplicates in Found File (Pre)
     print(f"\nScanning found file for ['1046', '1019']...")
     try:
-        df = pd.read_csv(found_path, header=None)
         targets = ['1046', '1019']
+        # One pass builds the value -> (row, col) index; each target is then a lookup
+        matches = CellIndex.from_csv(found_path).search(targets)
         
         for t in targets:
-            matches = df.applymap(lambda x: str(x).strip() == t)
-            found = matches.stack()
-            found = found[found]
+            found = matches[matches["Target"] == t]
             if not found.empty:
                 print(f"  FOUND '{t}' at:")
-                for idx in found.index:
-                    print(f"    Row: {idx[0]}, Col: {idx[1]}")
+                for row, col in zip(found["Row"], found["Column Position"]):
+                    print(f"    Row: {row}, Col: {col}")
             else:
                 print(f"  '{t}' NOT FOUND.")
                 
@@ -43,16 +42,14 @@ def locate_and_search():
         post_path = os.path.join(parent, "post_values.csv")
         if os.path.exists(post_path):
              print(f"\nScanning Post file at {post_path} for ['1023', '1011']...")
-             df_post = pd.read_csv(post_path, header=None)
              targets_post = ['1023', '1011']
+             matches_post = CellIndex.from_csv(post_path).search(targets_post)
              for t in targets_post:
-                matches = df_post.applymap(lambda x: str(x).strip() == t)
-                found = matches.stack()
-                found = found[found]
+                found = matches_post[matches_post["Target"] == t]
                 if not found.empty:
                     print(f"  FOUND '{t}' at:")
-                    for idx in found.index:
-                         print(f"    Row: {idx[0]}, Col: {idx[1]}")
+                    for row, col in zip(found["Row"], found["Column Position"]):
+                         print(f"    Row: {row}, Col: {col}")
                 else:
                     print(f"  '{t}' NOT FOUND.")
 
@@ -0,0 +1,178 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from record_index import RecordIndex
+from cell_index import CellIndex
+from explorer import DatasetExplorer
+from instrumentation import PipelineReport, stage, memory_tracing
+from processing import (process_survey_data, generate_docx_dictionary, clean_for_spss,
+                        write_spss_sav, write_merged, OUTPUT_FORMATS)
+
+@dataclass
+class DatasetJob:
+    """
+    One values/labels upload pair to merge.
+
+    Attributes:
+        name: Dataset name passed to process_survey_data, also the SPSS prefix ('pre', 'post').
+        values_file: Path or file object of the 'Numeric Values' export.
+        labels_file: Path or file object of the 'Choice Text' export.
+        unique_id_col: QID of the unique identifier column.
+        title: Display name, used as the Excel sheet name (defaults to name).
+    """
+    name: str
+    values_file: object
+    labels_file: object
+    unique_id_col: str = 'Q2'
+    title: str = None
+
+@dataclass
+class DatasetResult:
+    """
+    Outcome of a DatasetJob: the merged frame and Codebook, the exports built so far
+    (as bytes) and any errors. A failed merge leaves df as None and sets error; a failed
+    export is recorded in export_errors without affecting the other exports.
+    report holds the per-stage timings of the merge and exports (None for cached results).
+    cache_key is set once the result is stored in (or loaded from) a result_cache.ResultCache.
+    """
+    name: str
+    title: str
+    df: object = None
+    codebook: object = None
+    artifacts: dict = field(default_factory=dict)
+    error: str = None
+    export_errors: dict = field(default_factory=dict)
+    report: PipelineReport = None
+    cache_key: str = None
+    _record_index: object = field(default=None, repr=False)
+    _cell_index: object = field(default=None, repr=False)
+    _explorer: object = field(default=None, repr=False)
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def record_index(self):
+        """RecordIndex of the merged frame's RecordIDs, built on first use (None if not merged)."""
+        if self._record_index is None and self.df is not None:
+            self._record_index = RecordIndex.from_frame(self.df)
+        return self._record_index
+
+    @property
+    def cell_index(self):
+        """CellIndex of every cell of the merged frame, built on first use (None if not merged)."""
+        if self._cell_index is None and self.df is not None:
+            self._cell_index = CellIndex(self.df)
+        return self._cell_index
+
+    @property
+    def explorer(self):
+        """DatasetExplorer over the merged frame, sharing its RecordIndex (None if not merged)."""
+        if self._explorer is None and self.df is not None:
+            self._explorer = DatasetExplorer(self.df, self.codebook, self.record_index)
+        return self._explorer
+
+def _build_merged(fmt):
+    return lambda result: write_merged(result.df, fmt, sheet_name=result.title)
+
+# Export kind -> builder; the merged data formats use their OUTPUT_FORMATS key
+EXPORTS = {fmt: _build_merged(fmt) for fmt in OUTPUT_FORMATS}
+EXPORTS.update({
+    'docx': lambda result: generate_docx_dictionary(result.df, result.codebook),
+    'spss_csv': lambda result: clean_for_spss(result.df, result.name, result.codebook).to_csv(index=False).encode('utf-8'),
+    'sav': lambda result: write_spss_sav(result.df, result.name, result.codebook),
+})
+
+def build_export(result, kind):
+    """Builds one export of a merged dataset (see EXPORTS) and returns its bytes."""
+    if kind not in EXPORTS:
+        raise ValueError(f"Unknown export '{kind}'. Expected one of {tuple(EXPORTS)}.")
+    with stage(result.report, f"serialize ({kind})", result.name) as stats:
+        output = EXPORTS[kind](result)
+        output = output.getvalue() if hasattr(output, 'getvalue') else output
+        stats.rows, stats.cols = result.df.shape
+    return output
+
+def _merge(job, report=None):
+    if hasattr(job.values_file, 'seek'):
+        job.values_file.seek(0)
+    if hasattr(job.labels_file, 'seek'):
+        job.labels_file.seek(0)
+    return process_survey_data(job.values_file, job.labels_file, dataset_name=job.name,
+                               unique_id_col=job.unique_id_col, return_codebook=True, report=report)
+
+def _pool_size(n_tasks, max_workers):
+    # More threads than cores only adds contention for the GIL-bound parts
+    return max_workers or max(1, min(n_tasks, os.cpu_count() or 1))
+
+def _submit_exports(pool, result, exports):
+    """Queues the exports the result does not have yet; returns {future: (result, kind)}."""
+    return {pool.submit(build_export, result, kind): (result, kind)
+            for kind in exports if kind not in result.artifacts}
+
+def _collect_exports(futures):
+    for future in as_completed(futures):
+        result, kind = futures[future]
+        try:
+            result.artifacts[kind] = future.result()
+        except Exception as e:
+            result.export_errors[kind] = str(e)
+
+def run_datasets(jobs, exports=(), max_workers=None, trace_memory=False):
+    """
+    Merges independent datasets concurrently on a thread pool and builds the requested
+    exports of each dataset as soon as its merge is done, so on a multi-core machine a
+    pre+post job takes about as long as the slower of the two. The heavy steps (pyarrow
+    parsing, numpy kernels, zlib) release the GIL, and results stay in memory without pickling.
+
+    Args:
+        jobs: Iterable of DatasetJob.
+        exports: Export kinds (keys of EXPORTS) to build for every merged dataset.
+        max_workers: Pool size; defaults to one worker per merge and export, at most one per CPU.
+        trace_memory: Record peak memory per stage in each result's report (slower).
+
+    Returns:
+        dict: {job.name: DatasetResult}, in job order. Failures are reported on the
+        result of the dataset (and export) they belong to, never raised.
+    """
+    jobs = list(jobs)
+    unknown = [kind for kind in exports if kind not in EXPORTS]
+    if unknown:
+        raise ValueError(f"Unknown export(s) {unknown}. Expected any of {tuple(EXPORTS)}.")
+    results = {job.name: DatasetResult(job.name, job.title or job.name, report=PipelineReport(trace_memory))
+               for job in jobs}
+    if not jobs:
+        return results
+
+    with memory_tracing(trace_memory), \
+            ThreadPoolExecutor(max_workers=_pool_size(len(jobs) * (1 + len(exports)), max_workers)) as pool:
+        merges = {pool.submit(_merge, job, results[job.name].report): job for job in jobs}
+        export_futures = {}
+        for future in as_completed(merges):
+            result = results[merges[future].name]
+            try:
+                result.df, result.codebook = future.result()
+            except Exception as e:
+                result.error = str(e)
+                continue
+            export_futures.update(_submit_exports(pool, result, exports))
+        _collect_exports(export_futures)
+    return results
+
+def run_exports(results, exports, max_workers=None):
+    """
+    Builds the missing exports of already merged datasets concurrently.
+
+    Args:
+        results: Iterable of DatasetResult; failed merges are skipped.
+        exports: Export kinds (keys of EXPORTS).
+        max_workers: Pool size; defaults to one worker per export, at most one per CPU.
+    """
+    merged = [result for result in results if result.ok]
+    trace_memory = any(result.report is not None and result.report.trace_memory for result in merged)
+    with memory_tracing(trace_memory), ThreadPoolExecutor(max_workers=_pool_size(len(merged) * len(exports), max_workers)) as pool:
+        futures = {}
+        for result in merged:
+            futures.update(_submit_exports(pool, result, exports))
+        _collect_exports(futures)
@@ -1,41 +1,359 @@
 import pandas as pd
+import numpy as np
 import io
+import json
+import re
+from itertools import zip_longest
+from codebook import Codebook, CodebookEntry, spss_name, is_open_ended
+from instrumentation import stage
 
-def process_survey_data(values_file, labels_file, dataset_name=None, unique_id_col='Q2'):
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # Optional fast parser; the pandas reader is used without it
+    pa = None
+
+ENGINES = ('auto', 'pyarrow', 'pandas')
+
+# pandas' default NA markers, so the pyarrow reader treats the same cells as missing
+NA_VALUES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+]
+
+def _normalize_block(block):
     """
-    Merges Qualtrics values and labels datasets into a single DataFrame.
-    
+    Normalizes every cell of a raw data block in a single vectorized pass.
+
+    Survey blocks hold very few distinct strings (Likert codes, answer texts), so the
+    block is factorized once and the astype(str).str.strip() clean-up runs over the
+    uniques only. Missing cells become empty strings, as the old per-column
+    .replace('nan', '') did.
+
+    Args:
+        block: pd.DataFrame slice of raw (header=None) CSV cells.
+
+    Returns:
+        tuple: (codes, uniques) where codes is a 2D int array shaped like the block
+        (column-major, so each column is a contiguous slice) and uniques holds the
+        distinct cleaned strings in sorted order.
+    """
+    if block.shape[1] == 0:
+        return np.empty(block.shape, dtype=np.intp), np.array([''], dtype=object)
+
+    # Stack the columns end to end; this works for both object and Arrow-backed string
+    # columns without materializing a 2D object array first.
+    flat = pd.concat([col for _, col in block.items()], ignore_index=True)
+    codes, uniques = pd.factorize(flat)
+    cleaned = pd.Series(uniques, dtype=object).astype(str).str.strip().to_numpy(dtype=object)
+    # Code -1 (missing) indexes this trailing '' entry
+    cleaned = np.append(cleaned, '')
+
+    # Stripping can make distinct raw strings equal (' Agree' / 'Agree'), so factorize
+    # again to give each cleaned string exactly one code. Sorting here means any subset
+    # of codes taken in ascending order is also in sorted string order.
+    remap, uniques = pd.factorize(cleaned, sort=True)
+    return remap[codes].reshape(block.shape, order='F'), uniques
+
+def _text_array(codes, strings):
+    """
+    Column of strings[codes] as a pandas 'str' array. With pyarrow the rows are taken
+    straight into one Arrow string buffer (no Python object per row); without it this
+    is a plain object array.
+    """
+    if pa is None:
+        return strings[codes]
+    return pd.array(pa.array(strings, pa.string()).take(codes), dtype='str')
+
+def _label_array(codes, label_strings):
+    """
+    Builds one (Label) column from its codes into the block's cleaned strings.
+
+    Answer texts repeat across respondents, so low-cardinality columns are stored as
+    a Categorical (each distinct label held once plus a small integer code per row).
+    Columns where most rows are distinct (IDs, free text) are stored as compact Arrow
+    strings (see _text_array), where a Categorical would only add overhead. Either way
+    the column reads and exports as text.
+
+    Args:
+        codes: 1D codes for this column, as returned by _normalize_block.
+        label_strings: The cleaned strings the codes index into.
+
+    Returns:
+        pd.Categorical or np.ndarray: The Label column values.
+    """
+    local_codes, used = pd.factorize(codes, sort=True)
+    if len(used) > len(codes) // 2:
+        return _text_array(codes, label_strings)
+    return pd.Categorical.from_codes(local_codes, categories=label_strings[used])
+
+def _column_pairs(col_val, codes, label_strings):
+    """
+    Distinct (value, label) pairs of one question, computed from the merge codes.
+
+    Rows with a missing value are skipped, as the dictionary always did.
+
+    Args:
+        col_val: The merged Value column (Int64 array, or strings for RecordID).
+        codes: 1D label codes for the column, as returned by _normalize_block.
+        label_strings: The cleaned label strings the codes index into.
+
+    Returns:
+        list: (value, label) tuples in first-seen order.
+    """
+    if isinstance(col_val, pd.arrays.IntegerArray):
+        present = ~col_val.isna()
+        values = col_val.to_numpy(dtype='int64', na_value=0)[present]
+    else:
+        present = col_val != ''
+        values = col_val[present]
+
+    value_codes, value_uniques = pd.factorize(values)
+    n_labels = len(label_strings)
+    keys = pd.unique(value_codes.astype('int64') * n_labels + codes[present])
+    return list(zip(np.asarray(value_uniques)[keys // n_labels].tolist(), label_strings[keys % n_labels].tolist()))
+
+def _answer_counts(codes, label_strings):
+    """(distinct answers, answered rows) of one label column; blank cells do not count."""
+    # label_strings is sorted, so a blank label can only be code 0
+    answered = codes[codes != 0] if len(label_strings) and label_strings[0] == '' else codes
+    return len(pd.unique(answered)), len(answered)
+
+def _merge_blocks(values_block, labels_block, new_headers, codebook=None, first=True):
+    """
+    Builds the interleaved Value/Label DataFrame from the raw values and labels blocks.
+
+    Both blocks are normalized once, the numeric conversion of the Values block runs
+    over its distinct strings only, and the result frame is allocated in a single
+    constructor call instead of inserting two columns per question. Value columns
+    that the reader already parsed as numbers skip the string clean-up entirely.
+
+    Args:
+        values_block: Data rows/question columns sliced from the Values CSV.
+        labels_block: Data rows/question columns sliced from the Labels CSV.
+        new_headers: Composite headers ("Qx. Question Text" or "RecordID"), one per column.
+        codebook: Optional Codebook with one entry per column; the (value, label) pairs
+            seen in these rows are added to it, and columns with too many distinct answers
+            are marked open-ended (see codebook.is_open_ended).
+        first: Whether these are the first rows merged into the codebook. Only then may an
+            open-ended question lose its Value column, so every chunk of a streamed merge
+            keeps the same columns.
+
+    Returns:
+        pd.DataFrame: Columns "<header> (Value)", "<header> (Label)" for each question.
+        Label columns with repeated answer texts are Categoricals (see _label_array).
+        Open-ended questions whose Value column would hold no numbers at all (free text)
+        keep only their Label column.
+    """
+    # Only text columns go through the string clean-up; typed numeric columns are used as-is
+    text_positions = [i for i, (_, col) in enumerate(values_block.items()) if not pd.api.types.is_numeric_dtype(col)]
+    text_index = {pos: j for j, pos in enumerate(text_positions)}
+    value_codes, value_strings = _normalize_block(values_block.iloc[:, text_positions])
+    label_codes, label_strings = _normalize_block(labels_block)
+
+    # errors='coerce' turns non-numeric to NaN. Only strings that occur in a question's
+    # Value column are converted: the RecordID column keeps its string form, so leading
+    # zeros survive and IDs that are no int64 (20 digits, 2.5) cannot fail the merge.
+    numeric_positions = [text_index[i] for i, header in enumerate(new_headers)
+                         if i in text_index and header != "RecordID"]
+    used = np.unique(value_codes[:, numeric_positions])
+    value_numbers = pd.to_numeric(pd.Series(value_strings[used]), errors='coerce').astype('Int64')
+    value_ints = np.zeros(len(value_strings), dtype='int64')
+    value_missing = np.ones(len(value_strings), dtype=bool)
+    value_ints[used] = value_numbers.to_numpy(dtype='int64', na_value=0)
+    value_missing[used] = value_numbers.isna().to_numpy()
+
+    columns = {}
+    names = []
+    for i, header in enumerate(new_headers):
+        if i not in text_index:
+            col_val = values_block.iloc[:, i].astype('Int64').array
+        elif header == "RecordID":
+            col_val = _text_array(value_codes[:, text_index[i]], value_strings)
+        else:
+            codes = value_codes[:, text_index[i]]
+            col_val = pd.arrays.IntegerArray(value_ints[codes], value_missing[codes])
+
+        entry = codebook.entries[i] if codebook is not None else None
+        if entry is not None:
+            if not entry.open_ended and is_open_ended(*_answer_counts(label_codes[:, i], label_strings)):
+                # Free text or IDs: the pairs would be one per respondent
+                entry.open_ended = True
+                entry._pairs.clear()
+            if first and entry.open_ended and header != "RecordID" and col_val.isna().all():
+                entry.has_value = False
+            if not entry.open_ended:
+                entry.add_pairs(_column_pairs(col_val, label_codes[:, i], label_strings))
+
+        if entry is None or entry.has_value:
+            columns[len(names)] = col_val
+            names.append(f"{header} (Value)")
+        columns[len(names)] = _label_array(label_codes[:, i], label_strings)
+        names.append(f"{header} (Label)")
+
+    # Keyed by position so repeated headers cannot overwrite each other
+    merged_data = pd.DataFrame(columns)
+    merged_data.columns = names
+    return merged_data
+
+# ImportIds Qualtrics gives the built-in metadata columns (A-Q) in the third header row
+QUALTRICS_METADATA_IDS = {
+    "startDate", "endDate", "status", "ipAddress", "progress", "duration", "finished",
+    "recordedDate", "_recordId", "recipientLastName", "recipientFirstName", "recipientEmail",
+    "externalDataReference", "locationLatitude", "locationLongitude", "distributionChannel",
+    "userLanguage",
+}
+
+# Used when the third header row carries no ImportId JSON (older exports)
+DEFAULT_DATA_START = 17
+
+def _rewind(file):
+    """Moves a file-like object back to its start so it can be read again (paths are left alone)."""
+    if hasattr(file, 'seek'):
+        file.seek(0)
+
+def _parse_import_id(cell):
+    """Returns the ImportId from a third-row header cell like {"ImportId":"QID4"}, or None."""
+    try:
+        return json.loads(cell).get("ImportId")
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+def _read_header(file):
+    """
+    Reads only the 3 Qualtrics header rows (QID, question text, ImportId JSON) and rewinds the file.
+
+    Args:
+        file: File-like object or path for a Values or Labels CSV.
+
+    Returns:
+        pd.DataFrame: The 3 header rows, one column per CSV column.
+    """
+    header = pd.read_csv(file, header=None, nrows=3, dtype=str)
+    _rewind(file)
+    if len(header) < 3:
+        raise ValueError("File is missing the 3 Qualtrics header rows.")
+    return header
+
+def _find_data_start(header):
+    """
+    Finds the first question column from the ImportIds in the third header row.
+
+    The metadata block is the leading run of columns whose ImportId is a built-in
+    Qualtrics field; everything after it is survey data. Falls back to column R
+    (index 17) if the header has no ImportIds.
+
+    Args:
+        header: The 3 header rows returned by _read_header.
+
+    Returns:
+        int: 0-based index of the first data column.
+    """
+    import_ids = [_parse_import_id(cell) for cell in header.iloc[2]]
+    if not any(import_ids):
+        data_start = DEFAULT_DATA_START
+    else:
+        data_start = 0
+        while data_start < len(import_ids) and import_ids[data_start] in QUALTRICS_METADATA_IDS:
+            data_start += 1
+
+    if data_start >= header.shape[1]:
+        raise ValueError(f"Dataset has no question columns after the {data_start} metadata columns. Expected Qualtrics format starting data at column R.")
+    return data_start
+
+def _find_response_id_col(header):
+    """Index of the ResponseId column (ImportId "_recordId"), or None."""
+    for i, (qid, cell) in enumerate(zip(header.iloc[0], header.iloc[2])):
+        if _parse_import_id(cell) == "_recordId" or str(qid).strip() == "ResponseId":
+            return i
+    return None
+
+def _check_headers_match(header_values, header_labels):
+    """
+    Raises ValueError unless both files have the same columns with the same QIDs, i.e.
+    they are the values and labels exports of the same survey.
+    """
+    if header_values.shape[1] != header_labels.shape[1]:
+        raise ValueError("Values and Labels files have different numbers of columns.")
+    qids_values = header_values.iloc[0].astype(str).str.strip().to_numpy()
+    qids_labels = header_labels.iloc[0].astype(str).str.strip().to_numpy()
+    mismatched = np.flatnonzero(qids_values != qids_labels)
+    if len(mismatched):
+        examples = ", ".join(f"column {i + 1}: '{qids_values[i]}' vs '{qids_labels[i]}'" for i in mismatched[:3])
+        raise ValueError(f"Values and Labels files have different QIDs in {len(mismatched)} column(s) ({examples}). Please upload both exports of the same survey.")
+
+def _row_alignment(values_ids, labels_ids):
+    """
+    Compares the ResponseId sequences of the values and labels rows.
+
+    Returns:
+        np.ndarray or None: None when the rows already line up; otherwise, for each
+        values row, the position of the labels row with the same ResponseId.
+
+    Raises:
+        ValueError: If the files do not hold the same (unique) responses.
+    """
+    values_index = pd.Index(values_ids)
+    labels_index = pd.Index(labels_ids)
+    if values_index.equals(labels_index):
+        return None
+    if len(values_index) != len(labels_index):
+        raise ValueError("Values and Labels files have different numbers of rows.")
+    if not (values_index.is_unique and labels_index.is_unique) or values_index.hasnans or labels_index.hasnans:
+        raise ValueError("Values and Labels rows are in a different order and their ResponseIds are blank or repeated, so they cannot be realigned.")
+    positions = labels_index.get_indexer(values_index)
+    if (positions < 0).any():
+        only_values = values_index[positions < 0]
+        raise ValueError(f"Values and Labels files contain different responses ({len(only_values)} ResponseId(s) only in the Values file, e.g. {only_values[0]}). Please upload both exports of the same download.")
+    return positions
+
+def verify_alignment(values_file, labels_file):
+    """
+    Checks that a values and a labels export line up: same number of columns, same
+    QIDs in every column and the same ResponseId on every row. Only the 3 header rows
+    and the ResponseId column are read.
+
     Args:
         values_file: File-like object or path for the Values CSV.
         labels_file: File-like object or path for the Labels CSV.
-        dataset_name: Optional string ('pre' or 'post') to customize headers (e.g. Q22 -> RecordID)
-        
+
     Returns:
-        pd.DataFrame: The cleaned and merged DataFrame.
+        dict: rows (values, labels), columns, and response_ids - 'identical', 'reordered'
+        (same responses in another order; process_survey_data realigns them) or
+        'unchecked' (no ResponseId column).
+
+    Raises:
+        ValueError: If the columns, QIDs or responses differ.
     """
-    # 1. Ingest
-    # We read without header initially to handle the 3-row header structure of Qualtrics
-    df_values = pd.read_csv(values_file, header=None)
-    df_labels = pd.read_csv(labels_file, header=None)
-    
-    # 2. Extract Header Info (Row 1 -> QID, Row 2 -> Question Text)
-    # 0-based index: Row 0 is QID (e.g. Q1), Row 1 is Text
-    # We only care about columns R (index 17) onwards for the merge
-    
-    # Verify we have enough columns
-    if df_values.shape[1] < 18:
-        raise ValueError("Dataset has fewer than 18 columns. Expected Qualtrics format starting data at column R.")
+    header_values = _read_header(values_file)
+    header_labels = _read_header(labels_file)
+    _check_headers_match(header_values, header_labels)
+    report = {'columns': header_values.shape[1], 'rows': None, 'response_ids': 'unchecked'}
+    response_id_col = _find_response_id_col(header_labels)
+    if response_id_col is None:
+        return report
 
-    # Slice the relevant parts (Metadata columns A-Q are index 0-16)
-    # The user wants to KEEP leading zeros in data, so we treat as string later.
-    # But for now, let's just focus on the structure.
-    
-    # Extract QIDs and Texts from the Labels file (usually safer, though Values should match)
-    qids = df_labels.iloc[0, 17:]
-    questions = df_labels.iloc[1, 17:]
-    
-    # 3. Build new Composite Header
-    # Format: "Qx. Question Text"
+    engine = _resolve_engine('auto', values_file, labels_file)
+    values_ids = _read_block(values_file, [response_id_col], engine, n_columns=report['columns']).iloc[:, 0]
+    labels_ids = _read_block(labels_file, [response_id_col], engine, n_columns=report['columns']).iloc[:, 0]
+    _rewind(values_file)
+    _rewind(labels_file)
+    report['rows'] = (len(values_ids), len(labels_ids))
+    report['response_ids'] = 'identical' if _row_alignment(values_ids, labels_ids) is None else 'reordered'
+    return report
+
+def _build_headers(qids, questions, unique_id_col):
+    """
+    Builds the composite "Qx. Question Text" headers, renaming the unique ID column to "RecordID".
+
+    Args:
+        qids: Header row 1 (QIDs) for the question columns.
+        questions: Header row 2 (question texts) for the question columns.
+        unique_id_col: QID of the column holding the respondent identifier.
+
+    Returns:
+        list: One header per question column.
+    """
     new_headers = []
     unique_id_found = False
     for i, (qid, question) in enumerate(zip(qids, questions)):
@@ -50,51 +368,130 @@ def process_survey_data(values_file, labels_file, dataset_name=None, unique_id_c
              new_headers.append(f"{q}. {t}")
              
     if not unique_id_found:
-        raise ValueError(f"Unique ID column '{unique_id_col}' not found in the dataset (checked columns from index 17 onwards). Please verify the column name.")
-    
-    # 4. Filter Data Rows
-    # Rows 0, 1, 2 are headers/metadata. Data starts at row 3.
-    data_values = df_values.iloc[3:, 17:].reset_index(drop=True)
-    data_labels = df_labels.iloc[3:, 17:].reset_index(drop=True)
-    
-    # 5. Merge Value and Label Columns
-    # We want: Col 1 Value, Col 1 Label, Col 2 Value, Col 2 Label...
-    merged_data = pd.DataFrame()
-    
-    # Ensure they have same number of columns/rows
-    # We'll use the headers count to iterate
-    for i, header in enumerate(new_headers):
-        # Column from Values
-        # Note: We need to ensure we are preserving leading zeros. 
-        # Pandas read_csv defaulting to infer types might loose them if we aren't careful.
-        # However, since we read with header=None, everything is initially object/mixed.
-        # Later we will apply whitespace stripping.
-        
-        col_val = data_values.iloc[:, i].astype(str).str.strip()
-        col_lab = data_labels.iloc[:, i].astype(str).str.strip()
-        
-        # Replace 'nan' string with empty if it occurred due to conversion
-        col_val = col_val.replace('nan', '')
-        col_lab = col_lab.replace('nan', '')
-        
-        if header == "RecordID":
-             # Force string type, strip whitespace, handle nan
-             col_val = col_val.astype(str).str.strip().replace('nan', '')
-        else:
-            # For non-identifier columns, convert Values to numeric (int)
-            # errors='coerce' turns non-numeric to NaN
-            col_val = pd.to_numeric(col_val, errors='coerce').astype('Int64')
-
-        # Add to new DF
-        # We can use the header for both, or differentiate. 
-        # Typically "Value" and "Label" suffixes help, but user asked for:
-        # "Record the number form values in one column, then record the label... in the adjacent column"
-        # "You'll be left with two columns for each question"
-        
-        merged_data[f"{header} (Value)"] = col_val
-        merged_data[f"{header} (Label)"] = col_lab
-        
-    # Heuristic Check: Do the Label columns look numeric?
+        raise ValueError(f"Unique ID column '{unique_id_col}' not found in the dataset (checked the question columns after the metadata block). Please verify the column name.")
+    return new_headers
+
+def _read_layout(values_file, labels_file, unique_id_col):
+    """
+    Reads the header rows of both files and works out which columns to load.
+
+    Only the 3 header rows are parsed here; the ImportIds tell us where the
+    metadata columns (A-Q: IP address, location, recipient details...) end, so the
+    data readers can skip them entirely.
+
+    Args:
+        values_file: File-like object or path for the Values CSV.
+        labels_file: File-like object or path for the Labels CSV.
+        unique_id_col: QID of the column holding the respondent identifier.
+
+    Returns:
+        tuple: (question_cols, numeric_cols, codebook, response_id_col) - the 0-based CSV
+        column indices to load, the subset of them whose Values column is expected to be
+        numeric (everything except the RecordID and "_TEXT" text-entry columns), a Codebook
+        with one entry (composite header, QID, text, ImportId) per loaded column, the
+        RecordID and text-entry ones marked open-ended, and the
+        index of the ResponseId metadata column (None if the export has none).
+    """
+    header_values = _read_header(values_file)
+    header_labels = _read_header(labels_file)
+    _check_headers_match(header_values, header_labels)
+
+    data_start = _find_data_start(header_labels)
+    question_cols = list(range(data_start, header_labels.shape[1]))
+
+    # QIDs and Texts come from the Labels file (usually safer, though Values should match)
+    new_headers = _build_headers(header_labels.iloc[0, data_start:], header_labels.iloc[1, data_start:], unique_id_col)
+
+    numeric_cols = set()
+    codebook = Codebook()
+    for col, header in zip(question_cols, new_headers):
+        import_id = _parse_import_id(header_labels.iloc[2, col])
+        text_entry = header == "RecordID" or (import_id or "").endswith("_TEXT")
+        if not text_entry:
+            numeric_cols.add(col)
+        codebook.entries.append(CodebookEntry(
+            header=header,
+            qid=str(header_labels.iloc[0, col]).strip(),
+            text=str(header_labels.iloc[1, col]).strip(),
+            import_id=import_id,
+            open_ended=text_entry,
+        ))
+    response_id_col = _find_response_id_col(header_labels)
+    if response_id_col is not None and response_id_col >= data_start:
+        response_id_col = None
+    return question_cols, numeric_cols, codebook, response_id_col
+
+def _resolve_engine(engine, *files):
+    """
+    Maps the engine option to the reader that will actually be used for files. pyarrow
+    only reads paths and binary streams, so 'auto' uses pandas for text streams
+    (io.StringIO, files opened in text mode).
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}'. Expected one of {ENGINES}.")
+    text_stream = any(isinstance(file, io.TextIOBase) for file in files)
+    if engine == 'auto':
+        return 'pyarrow' if pa is not None and not text_stream else 'pandas'
+    if engine == 'pyarrow' and pa is None:
+        raise ImportError("engine='pyarrow' requires the pyarrow package. Install it or use engine='pandas'.")
+    if engine == 'pyarrow' and text_stream:
+        raise ValueError("engine='pyarrow' needs paths or files opened in binary mode. Use engine='auto' or 'pandas' for text streams.")
+    return engine
+
+def _read_block(file, question_cols, engine, numeric_cols=(), n_columns=None):
+    """
+    Reads the data rows of the question columns from a Values or Labels CSV.
+
+    Args:
+        file: File-like object or path for the CSV.
+        question_cols: 0-based CSV column indices to load.
+        engine: 'pandas' or 'pyarrow' (see _resolve_engine).
+        numeric_cols: Columns to parse as numbers (pyarrow only); all others are strings.
+        n_columns: Number of columns in the file, if question_cols do not run to the last one.
+
+    Returns:
+        pd.DataFrame: One column per entry of question_cols, header rows excluded.
+    """
+    if engine == 'pandas':
+        # dtype=str keeps leading zeros (pandas may otherwise infer ints for parts of a large file)
+        return pd.read_csv(file, header=None, skiprows=3, usecols=question_cols, dtype=str)
+
+    # pyarrow: multithreaded parse with a schema taken from the header rows.
+    # skip_rows_after_names counts CSV rows rather than lines, so question texts
+    # with embedded newlines in the header are skipped correctly.
+    names = [str(i) for i in range(n_columns or question_cols[-1] + 1)]
+    include = [names[i] for i in question_cols]
+
+    def read(column_types):
+        _rewind(file)
+        table = pa_csv.read_csv(
+            file,
+            read_options=pa_csv.ReadOptions(column_names=names, skip_rows_after_names=3),
+            parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=include,
+                column_types=column_types,
+                null_values=NA_VALUES,
+                strings_can_be_null=True,
+                quoted_strings_can_be_null=True,
+            ),
+        )
+        return table.to_pandas()
+
+    text_types = {name: pa.string() for name in include}
+    if not numeric_cols:
+        return read(text_types)
+    try:
+        return read({**text_types, **{names[i]: pa.float64() for i in numeric_cols}})
+    except pa.ArrowInvalid:
+        # A "numeric" column holds text (e.g. an unmarked free-text field); read as
+        # strings and let the merge coerce it like the pandas path does.
+        return read(text_types)
+
+def _warn_if_numeric_labels(merged_data):
+    """
+    Prints a warning if the Label columns look numeric, i.e. the Values file was uploaded twice.
+    """
     # We check a few columns in the middle
     num_numeric_labels = 0
     check_cols = [c for c in merged_data.columns if "(Label)" in c][:5] # Check first 5 label cols
@@ -106,80 +503,725 @@ def process_survey_data(values_file, labels_file, dataset_name=None, unique_id_c
     if num_numeric_labels > 0:
         print("WARNING: It appears your Label columns contain numeric values. Please check if you uploaded the correct 'Labels' file (Choice Text).")
 
+def process_survey_data(values_file, labels_file, dataset_name=None, unique_id_col='Q2', engine='auto', return_codebook=False, report=None):
+    """
+    Merges Qualtrics values and labels datasets into a single DataFrame.
+    
+    Args:
+        values_file: File-like object or path for the Values CSV.
+        labels_file: File-like object or path for the Labels CSV.
+        dataset_name: Optional string ('pre' or 'post') to customize headers (e.g. Q22 -> RecordID)
+        unique_id_col: QID of the column holding the respondent identifier.
+        engine: CSV reader - 'pyarrow' (typed, multithreaded; paths and binary files only),
+            'pandas' (string parse), or 'auto' to use pyarrow when it is installed and
+            the files are not text streams.
+        return_codebook: Also return the Codebook (QIDs, texts, value/label pairs)
+            built during the merge, for generate_docx_dictionary and clean_for_spss.
+        report: Optional instrumentation.PipelineReport; the header, parse, validation
+            and merge stages are timed (and memory-traced if enabled) into it.
+        
+    Returns:
+        pd.DataFrame: The cleaned and merged DataFrame, or a (DataFrame, Codebook)
+        tuple when return_codebook is True.
+    """
+    # 1 & 2. Read Header Info (Row 1 -> QID, Row 2 -> Question Text, Row 3 -> ImportId JSON)
+    # and build the composite "Qx. Question Text" headers for the question columns
+    with stage(report, 'header', dataset_name) as stats:
+        question_cols, numeric_cols, codebook, response_id_col = _read_layout(values_file, labels_file, unique_id_col)
+        stats.cols = len(question_cols)
 
+    # 3. Ingest the question columns only; of the metadata columns just ResponseId is loaded
+    with stage(report, 'parse', dataset_name) as stats:
+        engine = _resolve_engine(engine, values_file, labels_file)
+        id_cols = [] if response_id_col is None else [response_id_col]
+        df_values = _read_block(values_file, id_cols + question_cols, engine, numeric_cols)
+        df_labels = _read_block(labels_file, id_cols + question_cols, engine)
+        stats.rows, stats.cols = len(df_values), len(question_cols)
+
+    # 3b. Pair the rows by ResponseId: if the labels rows are in another order, realign
+    # them with an index join instead of trusting their position
+    with stage(report, 'validation', dataset_name) as stats:
+        if len(df_values) != len(df_labels):
+            raise ValueError("Values and Labels files have different numbers of rows.")
+        if id_cols:
+            positions = _row_alignment(df_values.iloc[:, 0], df_labels.iloc[:, 0])
+            df_values, df_labels = df_values.iloc[:, 1:], df_labels.iloc[:, 1:]
+            if positions is not None:
+                print(f"WARNING: The Labels rows are in a different order than the Values rows; realigned {len(positions)} rows by ResponseId.")
+                df_labels = df_labels.take(positions)
+        stats.rows, stats.cols = df_values.shape
+
+    # 4. Normalize the data block and merge Value and Label columns
+    # We want: Col 1 Value, Col 1 Label, Col 2 Value, Col 2 Label...
+    # The Codebook collects each question's value/label pairs along the way
+    with stage(report, 'merge', dataset_name) as stats:
+        merged_data = _merge_blocks(df_values, df_labels, codebook.headers, codebook)
+        stats.rows, stats.cols = merged_data.shape
+        
+    # Heuristic Check: Do the Label columns look numeric?
+    with stage(report, 'validation', dataset_name):
+        _warn_if_numeric_labels(merged_data)
+
+    if return_codebook:
+        return merged_data, codebook
     return merged_data
 
+def stream_survey_data(values_file, labels_file, dataset_name=None, unique_id_col='Q2', chunksize=20000, codebook=None):
+    """
+    Streaming variant of process_survey_data for exports too large to load at once.
+
+    The 3 header rows are read once, then the Values and Labels files are read in
+    lock-step row chunks and each pair is merged on its own, so peak memory depends
+    on the chunk size rather than the file size.
+
+    Args:
+        values_file: File-like object or path for the Values CSV.
+        labels_file: File-like object or path for the Labels CSV.
+        dataset_name: Optional string ('pre' or 'post'), kept for parity with process_survey_data.
+        unique_id_col: QID of the column holding the respondent identifier.
+        chunksize: Number of data rows merged per chunk.
+        codebook: Optional empty Codebook; it is filled in as the chunks are merged and
+            is complete once the generator is exhausted.
+
+    Yields:
+        pd.DataFrame: Merged chunks with the same columns process_survey_data returns.
+    """
+    # 1. Read the header rows once
+    question_cols, _, layout, response_id_col = _read_layout(values_file, labels_file, unique_id_col)
+    if codebook is None:
+        codebook = layout
+    else:
+        codebook.entries[:] = layout.entries
+
+    # 2. Read the question columns of both files in lock-step chunks
+    # dtype=str so per-chunk type inference can never turn an ID like 0012 into 12
+    id_cols = [] if response_id_col is None else [response_id_col]
+    values_reader = pd.read_csv(values_file, header=None, skiprows=3, usecols=id_cols + question_cols, dtype=str, chunksize=chunksize)
+    labels_reader = pd.read_csv(labels_file, header=None, skiprows=3, usecols=id_cols + question_cols, dtype=str, chunksize=chunksize)
+
+    first_chunk = True
+    start = 0
+    with values_reader, labels_reader:
+        for values_chunk, labels_chunk in zip_longest(values_reader, labels_reader):
+            if values_chunk is None or labels_chunk is None or len(values_chunk) != len(labels_chunk):
+                raise ValueError("Values and Labels files have different numbers of rows.")
+            if id_cols:
+                # Chunks cannot be realigned across the file; the in-memory merge can
+                if _row_alignment(values_chunk.iloc[:, 0], labels_chunk.iloc[:, 0]) is not None:
+                    raise ValueError("Values and Labels rows are in a different order. Use process_survey_data, which realigns them by ResponseId.")
+                values_chunk, labels_chunk = values_chunk.iloc[:, 1:], labels_chunk.iloc[:, 1:]
+
+            merged_chunk = _merge_blocks(values_chunk, labels_chunk, codebook.headers, codebook, first=first_chunk)
+            # Continue the row numbering across chunks, as a single in-memory frame would have it
+            merged_chunk.index = pd.RangeIndex(start, start + len(merged_chunk))
+            start += len(merged_chunk)
+            if first_chunk:
+                _warn_if_numeric_labels(merged_chunk)
+                first_chunk = False
+            yield merged_chunk
+
+def write_merged_csv(chunks, output):
+    """
+    Incrementally writes merged chunks (e.g. from stream_survey_data) to a CSV.
+
+    Args:
+        chunks: Merged DataFrame, or an iterable of merged DataFrames sharing the same columns.
+        output: Path or file-like object (text or binary) to write to.
+
+    Returns:
+        int: Number of data rows written.
+    """
+    if isinstance(chunks, pd.DataFrame):
+        chunks = [chunks]
+    rows = 0
+    for i, chunk in enumerate(chunks):
+        chunk.to_csv(output, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+        rows += len(chunk)
+    return rows
+
+import zipfile
+from xml.sax.saxutils import escape
+
+# Characters XML 1.0 cannot carry; Excel and python-docx reject them
+_XML_INVALID = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# Cells rendered per batch; bounds the writer's working memory however wide the sheet is
+EXCEL_CHUNK_CELLS = 250000
+EXCEL_MAX_ROWS = 1048576
+EXCEL_MAX_COLS = 16384
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+_XLSX_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+_XLSX_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_XLSX_SHEET_END = '</sheetData></worksheet>'
+
+def _excel_cell(value):
+    """One worksheet <c> element: numbers stay numeric, everything else is an inline string."""
+    if isinstance(value, (bool, np.bool_)):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return f'<c><v>{value}</v></c>' if np.isfinite(value) else '<c/>'
+    text = _XML_INVALID.sub('', str(value))
+    if not text:
+        return '<c/>'
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+def _excel_column_cells(col):
+    """
+    One <c> element per row of a merged column. Survey columns hold few distinct values,
+    so each distinct value is rendered once and the rows look it up by factorize code.
+    Cells carry no reference, so missing values still need an empty <c/> to hold their place.
+    """
+    codes, uniques = pd.factorize(col)
+    # Code -1 (missing) indexes the trailing empty cell
+    table = np.array([_excel_cell(value) for value in uniques] + ['<c/>'], dtype=object)
+    return table[codes]
+
+def write_merged_excel(data, output=None, sheet_name='Sheet1', chunksize=None):
+    """
+    Streams a merged dataset to XLSX, writing the worksheet XML chunk by chunk straight
+    into the zip instead of building a cell object per value like pd.ExcelWriter.
+
+    Values are written as they are in the merged frame: Int64 columns become numeric
+    cells (empty when missing) and text, including RecordIDs, is written as inline
+    strings, so leading zeros survive and nothing is read back as a formula.
+
+    Args:
+        data: Merged DataFrame, or an iterable of merged chunks (e.g. from stream_survey_data).
+        output: Path or binary file-like object to write to. A new BytesIO is used if omitted.
+        sheet_name: Name of the worksheet.
+        chunksize: Rows rendered at a time. Defaults to about EXCEL_CHUNK_CELLS cells' worth.
+
+    Returns:
+        The output the workbook was saved to (the BytesIO when none was given).
+
+    Raises:
+        ValueError: If the sheet name is invalid or the data exceeds Excel's sheet size.
+    """
+    if not sheet_name or len(sheet_name) > 31 or re.search(r'[\[\]:*?/\\]', sheet_name):
+        raise ValueError(f"Invalid Excel sheet name: {sheet_name!r}")
+    if output is None:
+        output = io.BytesIO()
+    chunks = [data] if isinstance(data, pd.DataFrame) else data
+
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('[Content_Types].xml', _XLSX_CONTENT_TYPES)
+        zf.writestr('_rels/.rels', _XLSX_ROOT_RELS)
+        zf.writestr('xl/workbook.xml', _XLSX_WORKBOOK.format(name=escape(sheet_name, {'"': '&quot;'})))
+        zf.writestr('xl/_rels/workbook.xml.rels', _XLSX_WORKBOOK_RELS)
+        zf.writestr('xl/styles.xml', _XLSX_STYLES)
+
+        with zf.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(_XLSX_SHEET_START.encode('utf-8'))
+            rows_written = 0
+            for chunk in chunks:
+                if rows_written == 0:
+                    if len(chunk.columns) > EXCEL_MAX_COLS:
+                        raise ValueError(f"{len(chunk.columns)} columns exceed Excel's limit of {EXCEL_MAX_COLS}.")
+                    header = ''.join(_excel_cell(str(col)) for col in chunk.columns)
+                    sheet.write(('<row>' + header + '</row>').encode('utf-8'))
+                    rows_written = 1
+                if rows_written + len(chunk) > EXCEL_MAX_ROWS:
+                    raise ValueError(f"More than {EXCEL_MAX_ROWS - 1} data rows do not fit on one Excel sheet.")
+
+                step = chunksize or max(1, EXCEL_CHUNK_CELLS // max(1, len(chunk.columns)))
+                for start in range(0, len(chunk), step):
+                    part = chunk.iloc[start:start + step]
+                    cells = np.column_stack([_excel_column_cells(col) for _, col in part.items()])
+                    xml = ''.join(['<row>' + ''.join(row) + '</row>' for row in cells.tolist()])
+                    sheet.write(xml.encode('utf-8'))
+                    rows_written += len(part)
+            sheet.write(_XLSX_SHEET_END.encode('utf-8'))
+
+    if hasattr(output, 'seek'):
+        output.seek(0)
+    return output
+
+def _unify_labels(chunk, categories):
+    """
+    Returns the chunk with every Label column as a Categorical over one category list
+    per column that only grows (new labels are appended), so each chunk's Arrow
+    dictionary extends the previous one instead of replacing it.
+
+    Args:
+        chunk: Merged DataFrame.
+        categories: {column position: (labels list, label -> code dict)}, carried across chunks.
+    """
+    columns = {}
+    for i, (name, col) in enumerate(chunk.items()):
+        if not str(name).endswith(" (Label)"):
+            columns[i] = col
+            continue
+        if not isinstance(col.dtype, pd.CategoricalDtype):
+            col = col.astype('category')
+        labels, lookup = categories.setdefault(i, ([], {}))
+        for label in col.cat.categories:
+            if label not in lookup:
+                lookup[label] = len(labels)
+                labels.append(label)
+        remap = np.array([lookup[label] for label in col.cat.categories] + [-1], dtype=np.int32)
+        columns[i] = pd.Categorical.from_codes(remap[col.cat.codes.to_numpy()], categories=pd.Index(labels, dtype=object))
+    unified = pd.DataFrame(columns, index=chunk.index)
+    unified.columns = chunk.columns
+    return unified
+
+def _arrow_tables(data):
+    """
+    Yields one pyarrow Table per merged chunk, all with the schema of the first.
+
+    Label columns become dictionary<int32, string> columns, Int64 columns stay nullable
+    int64 and the pandas metadata is kept, so pandas reads the Value/Label pairs back
+    with the dtypes they were written with.
+    """
+    if pa is None:
+        raise ImportError("Parquet and Arrow output require the pyarrow package.")
+    chunks = [data] if isinstance(data, pd.DataFrame) else data
+    categories = {}
+    schema = None
+    for chunk in chunks:
+        table = pa.Table.from_pandas(_unify_labels(chunk, categories), preserve_index=False)
+        if schema is None:
+            fields = [pa.field(f.name, pa.dictionary(pa.int32(), pa.string())) if pa.types.is_dictionary(f.type) else f
+                      for f in table.schema]
+            schema = pa.schema(fields, metadata=table.schema.metadata)
+        yield table.cast(schema)
+
+def write_merged_parquet(data, output):
+    """
+    Streams a merged dataset to Parquet, one row group per chunk. Label columns are
+    dictionary-encoded, so each distinct answer text is stored once per row group.
+
+    Args:
+        data: Merged DataFrame, or an iterable of merged chunks (e.g. from stream_survey_data).
+        output: Path or binary file-like object to write to.
+    """
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for table in _arrow_tables(data):
+            if writer is None:
+                writer = pq.ParquetWriter(output, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+def write_merged_feather(data, output, compression='lz4'):
+    """
+    Streams a merged dataset to an Arrow IPC (Feather v2) file, one record batch per
+    chunk. Label columns are dictionary-encoded; later chunks only add dictionary deltas.
+
+    Args:
+        data: Merged DataFrame, or an iterable of merged chunks (e.g. from stream_survey_data).
+        output: Path or binary file-like object to write to.
+        compression: 'lz4', 'zstd' or None. Uncompressed files can be memory-mapped and
+            read without copying.
+    """
+    writer = None
+    try:
+        for table in _arrow_tables(data):
+            if writer is None:
+                options = pa.ipc.IpcWriteOptions(
+                    emit_dictionary_deltas=True,
+                    compression=compression if compression and pa.Codec.is_available(compression) else None,
+                )
+                writer = pa.ipc.new_file(output, table.schema, options=options)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+# Output formats for merged datasets: format -> (display name, file extension, MIME type)
+OUTPUT_FORMATS = {
+    'xlsx': ("Excel", "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    'parquet': ("Parquet", "parquet", "application/vnd.apache.parquet"),
+    'feather': ("Arrow IPC / Feather", "feather", "application/vnd.apache.arrow.file"),
+    'csv': ("CSV", "csv", "text/csv"),
+}
+
+_WRITERS = {
+    'xlsx': write_merged_excel,
+    'parquet': write_merged_parquet,
+    'feather': write_merged_feather,
+    'csv': write_merged_csv,
+}
+
+def write_merged(data, fmt='xlsx', output=None, sheet_name='Sheet1'):
+    """
+    Writes a merged dataset in one of OUTPUT_FORMATS.
+
+    Every format keeps the "(Value)"/"(Label)" column pairs in order, the nullable Int64
+    values and the RecordIDs as text.
+
+    Args:
+        data: Merged DataFrame, or an iterable of merged chunks (e.g. from stream_survey_data).
+        fmt: Key of OUTPUT_FORMATS.
+        output: Path or binary file-like object to write to. A new BytesIO is used if omitted.
+        sheet_name: Worksheet name, used by the 'xlsx' format only.
+
+    Returns:
+        The output the data was written to (the BytesIO when none was given).
+    """
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{fmt}'. Expected one of {tuple(OUTPUT_FORMATS)}.")
+    if output is None:
+        output = io.BytesIO()
+    options = {'sheet_name': sheet_name} if fmt == 'xlsx' else {}
+    _WRITERS[fmt](data, output, **options)
+    if hasattr(output, 'seek'):
+        output.seek(0)
+    return output
+
 from docx import Document
-from docx.shared import Pt
+from docx.shared import Pt, Inches, Emu
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+
+
+def _cell_xml(text, width):
+    """One <w:tc> with a single run, laid out the way python-docx's cell.text setter does."""
+    runs = []
+    for i, line in enumerate(re.split('[\r\n]', _XML_INVALID.sub('', str(text)))):
+        if i:
+            runs.append('<w:br/>')
+        for j, part in enumerate(line.split('\t')):
+            if j:
+                runs.append('<w:tab/>')
+            if part:
+                space = ' xml:space="preserve"' if part != part.strip() else ''
+                runs.append(f'<w:t{space}>{escape(part)}</w:t>')
+    return f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{width}"/></w:tcPr><w:p><w:r>{"".join(runs)}</w:r></w:p></w:tc>'
+
+def _add_pairs_table(doc, pairs):
+    """
+    Appends a 'Table Grid' Value (SPSS)/Label table for the given pairs to the document.
+
+    The whole table is rendered as one XML string and parsed once, instead of going
+    through table.add_row().cells for every row, which dominates the run time on
+    surveys with hundreds of questions.
 
-def generate_docx_dictionary(df):
+    Args:
+        doc: The python-docx Document.
+        pairs: (value, label) tuples, already sorted.
+    """
+    # Two equal columns spanning the text width, as doc.add_table(rows, 2) lays them out
+    section = doc.sections[-1]
+    block_width = (section.page_width or Inches(8.5)) - (section.left_margin or Inches(1)) - (section.right_margin or Inches(1))
+    width = Emu(block_width // 2).twips
+
+    rows = [('Value (SPSS)', 'Label')] + list(pairs)
+    body = ''.join(f'<w:tr>{_cell_xml(value, width)}{_cell_xml(label, width)}</w:tr>' for value, label in rows)
+    tbl = parse_xml(
+        f'<w:tbl {nsdecls("w")}>'
+        '<w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:type="auto" w:w="0"/>'
+        '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" w:noHBand="0" w:noVBand="1" w:val="04A0"/></w:tblPr>'
+        f'<w:tblGrid><w:gridCol w:w="{width}"/><w:gridCol w:w="{width}"/></w:tblGrid>'
+        f'{body}</w:tbl>'
+    )
+    # Same insertion point python-docx uses for add_table (before the final sectPr)
+    doc.element.body._insert_tbl(tbl)
+
+# Matrix sub-questions: Q5_1, Q5_2, ... (not Q5_6_TEXT text-entry columns)
+_MATRIX_QID = re.compile(r"^(Q\d+)_\d+$")
+
+def _dictionary_sections(entries):
+    """
+    Groups codebook entries into dictionary sections, in the order the questions first
+    appear: (parent QID, [entries]) for matrix blocks with 2+ sub-questions, (None, [entry])
+    for any other question.
+    """
+    blocks = {}
+    for entry in entries:
+        match = _MATRIX_QID.match(entry.qid)
+        key = match.group(1) if match else entry.header
+        blocks.setdefault(key, []).append(entry)
+    sections = []
+    for key, items in blocks.items():
+        if len(items) > 1:
+            sections.append((key, items))
+        else:
+            sections.extend((None, [item]) for item in items)
+    return sections
+
+def _matrix_stem(items):
+    """Question text shared by a matrix block's sub-questions ("Rate the following. - Statement 1" -> "Rate the following.")."""
+    stems = {item.text.partition(" - ")[0] for item in items}
+    return stems.pop() if len(stems) == 1 else items[0].text
+
+def generate_docx_dictionary(df, codebook=None):
     """
     Generates a DOCX Data Dictionary from the merged dataframe.
+
+    Answer scales (identical sets of value/label pairs) used by more than one question,
+    such as a 5-point agreement scale, are listed once under 'Observed Answer Scales' and
+    each question refers to its scale by number; a scale used by a single question is
+    shown in place. The exports carry no survey definition, so a scale is the set of
+    responses actually given: an option nobody chose is missing, and two questions on
+    the same full scale are listed separately when their observed answers differ.
+
+    Matrix sub-questions (Q5_1, Q5_2, ...) are grouped under their parent block.
+    Open-ended questions (free text, IDs; see CodebookEntry.open_ended) are listed without
+    a table, which would otherwise hold one row per respondent.
     
     Args:
         df: The merged pd.DataFrame containing (Value) and (Label) columns.
+        codebook: The Codebook returned by process_survey_data. Without one, the
+            value/label pairs are rediscovered by scanning df.
         
     Returns:
         BytesIO: The DOCX file in memory.
     """
+    if codebook is None:
+        codebook = Codebook.from_dataframe(df)
+
     doc = Document()
     doc.add_heading('Data Dictionary', 0)
-    
-    # Identify Question Groups
-    # We look for columns ending in " (Value)"
-    # The corresponding label column should be " (Label)"
-    
-    # We iterate through columns 
-    # The structure is usually: Q1 (Value), Q1 (Label), Q2 (Value), Q2 (Label)...
-    
-    processed_bases = set()
-    
-    for col in df.columns:
-        if col.endswith(" (Value)"):
-            base_name = col[:-len(" (Value)")] # e.g. "Q1. Question Text"
-            
-            if base_name in processed_bases:
-                continue
-                
-            processed_bases.add(base_name)
-            
-            label_col = f"{base_name} (Label)"
-            if label_col not in df.columns:
-                continue # Skip if no matching label column
-            
-            # --- Add Section for this Question ---
-            doc.add_heading(base_name, level=2)
-            
-            # Extract Unique Pairs
-            # Drop duplicates and N/A
-            pairs = df[[col, label_col]].drop_duplicates().dropna()
-            
-            # Sort by Value (try numeric sort if possible)
-            try:
-                pairs['sort_key'] = pd.to_numeric(pairs[col])
-                pairs = pairs.sort_values('sort_key')
-            except:
-                pairs = pairs.sort_values(col)
-            
-            # Create Table
-            table = doc.add_table(rows=1, cols=2)
-            table.style = 'Table Grid'
-            
-            # Header
-            hdr_cells = table.rows[0].cells
-            hdr_cells[0].text = 'Value (SPSS)'
-            hdr_cells[1].text = 'Label'
-            
-            # Data Rows
-            for index, row in pairs.iterrows():
-                row_cells = table.add_row().cells
-                row_cells[0].text = str(row[col])
-                row_cells[1].text = str(row[label_col])
-                
+    doc.add_paragraph("Value/label tables list the responses observed in the data; "
+                      "answer options no respondent chose do not appear.")
+    # Resolved once; doc.add_heading looks the style up by name (a scan of every style) on each call
+    styles = {level: doc.styles[f'Heading {level}'].style_id for level in (1, 2, 3)}
+
+    def heading(text, level):
+        paragraph = doc.add_paragraph(text)
+        paragraph._p.style = styles[level]
+
+    # 1. One section per question with both a (Value) and a (Label) column, or just the
+    #    Label column of a free-text question, in merged order
+    entries, processed_bases = [], set()
+    for entry in codebook:
+        if not (entry.has_label and (entry.has_value or entry.open_ended)) or entry.header in processed_bases:
+            continue
+        processed_bases.add(entry.header)
+        entries.append(entry)
+    sections = _dictionary_sections(entries)
+
+    # 2. Number the scales shared by 2+ questions, in order of first use (a matrix block
+    #    whose statements all use one scale counts as a single question; open-ended
+    #    questions have no scale, None)
+    scale_of = {entry.header: None if entry.open_ended else tuple(entry.pairs) for entry in entries}
+    users = {}
+    for parent, items in sections:
+        scales = {scale_of[item.header] for item in items}
+        if parent is not None and len(scales) == 1:
+            users.setdefault(scales.pop(), []).append(parent)
+            continue
+        for item in items:
+            users.setdefault(scale_of[item.header], []).append(item.qid)
+    shared = {}
+    for scale, qids in users.items():
+        if len(qids) > 1 and scale:
+            shared[scale] = len(shared) + 1
+
+    def add_scale(scale):
+        # Reference a shared scale, draw a table for a question's own one (pairs are already unique and sorted)
+        if scale is None:
+            doc.add_paragraph("Open-ended answers (free text or IDs); not tabulated.")
+        elif scale in shared:
+            doc.add_paragraph(f"Observed responses: Scale {shared[scale]}")
+        else:
+            _add_pairs_table(doc, scale)
+
+    if shared:
+        heading('Observed Answer Scales', 1)
+        for scale, number in shared.items():
+            heading(f"Scale {number}", 2)
+            qids = users[scale]
+            doc.add_paragraph(f"Used by {len(qids)} questions: {', '.join(qids)}")
+            _add_pairs_table(doc, scale)
             doc.add_paragraph() # Spacer
+        heading('Questions', 1)
+
+    # 3. Questions, matrix blocks with their sub-questions underneath
+    for parent, items in sections:
+        if parent is None:
+            heading(items[0].header, 2)
+            add_scale(scale_of[items[0].header])
+        else:
+            heading(f"{parent}. {_matrix_stem(items)}", 2)
+            scales = {scale_of[item.header] for item in items}
+            if len(scales) == 1:
+                # The usual matrix: every statement on the same scale, shown once for the block
+                add_scale(scales.pop())
+                for item in items:
+                    heading(item.header, 3)
+            else:
+                for item in items:
+                    heading(item.header, 3)
+                    add_scale(scale_of[item.header])
+        doc.add_paragraph() # Spacer
             
     # Save to BytesIO
     f = io.BytesIO()
     doc.save(f)
     f.seek(0)
     return f
+
+MERGED_FILE_TYPES = ('xlsx', 'csv', 'parquet', 'feather')
+
+def read_merged_file(file):
+    """
+    Loads a merged dataset saved by this tool, e.g. to run clean_for_spss on it later.
+
+    RecordIDs are read as text so leading zeros survive, blank text cells come back as
+    '' and whole-number Value columns are restored to nullable Int64.
+
+    Args:
+        file: Path or uploaded file object ending in .xlsx, .csv, .parquet or .feather.
+
+    Returns:
+        pd.DataFrame: The merged dataset.
+    """
+    name = str(getattr(file, 'name', file))
+    ext = name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+    if ext not in MERGED_FILE_TYPES:
+        raise ValueError(f"Unsupported merged file type '{name}'. Expected one of: {', '.join(MERGED_FILE_TYPES)}")
+
+    if ext == 'parquet':
+        return pd.read_parquet(file)
+    if ext == 'feather':
+        return pd.read_feather(file)
+
+    id_types = {"RecordID (Value)": str, "RecordID (Label)": str}
+    if ext == 'csv':
+        df = pd.read_csv(file, dtype=id_types)
+    else:
+        df = pd.read_excel(file, dtype=id_types)
+
+    for col in df.columns:
+        values = df[col]
+        if not pd.api.types.is_numeric_dtype(values):
+            # Blank text is '' in merged frames, as process_survey_data produces it
+            df[col] = values.fillna('')
+        elif str(col).endswith(" (Value)") and (values.dropna() % 1 == 0).all():
+            df[col] = values.astype('Int64')
+    return df
+
+def clean_for_spss(df, prefix, codebook=None):
+    """
+    Cleans DataFrame for SPSS:
+    1. Removes 'RecordID (Value)' column.
+    2. Renames 'RecordID (Label)' -> 'RecordID'.
+    3. For all other questions:
+       - DROPS the Text Label column (e.g. "Q1 (Label)")
+       - KEEPS the Numeric Value column (e.g. "Q1 (Value)")
+       - Renames the Value column to "{prefix}_{Qnumber}" (e.g. pre_Q1)
+       Free-text questions merged without a Value column keep their Label column (the
+       text) under that name instead.
+
+    Args:
+        df: The merged pd.DataFrame.
+        prefix: 'pre' or 'post'.
+        codebook: The Codebook returned by process_survey_data. Without one, the
+            question layout is rebuilt from the column names.
+    """
+    if codebook is None:
+        codebook = Codebook.from_columns(df.columns)
+
+    new_cols = {}
+    cols_to_drop = []
+    for entry in codebook:
+        if entry.header == "RecordID":
+            # 1 & 2. Drop Value version, rename Label version
+            if entry.has_value:
+                cols_to_drop.append(entry.value_column)
+            if entry.has_label:
+                new_cols[entry.label_column] = "RecordID"
+            continue
+
+        new_name = spss_name(entry, prefix)
+        if new_name is None:
+            continue
+        # 3. DROP text labels, KEEP numerical values and rename (e.g. pre_Q1)
+        if not entry.has_value:
+            if entry.has_label:
+                new_cols[entry.label_column] = new_name
+            continue
+        if entry.has_label:
+            cols_to_drop.append(entry.label_column)
+        new_cols[entry.value_column] = new_name
+
+    # Apply changes
+    df = df.drop(columns=[c for c in cols_to_drop if c in df.columns])
+    df = df.rename(columns=new_cols)
+    
+    return df
+
+from sav_writer import write_sav
+
+def write_spss_sav(df, prefix, codebook=None, output=None):
+    """
+    Writes the SPSS-ready version of a merged dataset (see clean_for_spss) as a
+    compressed .sav file, so the labels no longer have to be re-entered from the dictionary.
+
+    Each question variable gets its question text as the variable label and its
+    (value, label) answer pairs as value labels.
+
+    Args:
+        df: The merged pd.DataFrame.
+        prefix: 'pre' or 'post'.
+        codebook: The Codebook returned by process_survey_data. Without one, it is
+            rebuilt by scanning the merged DataFrame.
+        output: Path or binary file-like object to write to. A new BytesIO is used if omitted.
+
+    Returns:
+        The output the file was written to (the BytesIO when none was given).
+    """
+    if codebook is None:
+        codebook = Codebook.from_dataframe(df)
+
+    variable_labels = {}
+    value_labels = {}
+    for entry in codebook:
+        name = spss_name(entry, prefix)
+        if name is None or not (entry.has_value or entry.has_label):
+            continue
+        if entry.text:
+            variable_labels[name] = entry.text
+        labels = {value: label for value, label in entry.value_labels.items() if pd.api.types.is_number(value)}
+        if labels:
+            value_labels[name] = labels
+
+    spss_df = clean_for_spss(df, prefix, codebook)
+    return write_sav(spss_df, output, variable_labels, value_labels, file_label=f"{prefix} survey")
@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+
+RECORD_ID_COLUMN = "RecordID (Value)"
+
+def normalize_ids(ids):
+    """
+    Canonical form of respondent IDs, so spellings of the same ID compare equal:
+    all whitespace removed, float spellings of whole numbers ('1046.0') and leading
+    zeros of all-digit IDs ('001046') dropped, and numbers and text compared as text.
+
+    Args:
+        ids: Sequence or Series of IDs (numbers, strings or missing values).
+
+    Returns:
+        pd.Series: Normalized str IDs (same index as a Series input); blank or
+        missing IDs are NaN.
+    """
+    ids = ids if isinstance(ids, pd.Series) else pd.Series(list(ids), dtype=object)
+    # Whole-number floats (from a numeric read) first, so 1046.0 -> '1046' and not '10460'
+    if pd.api.types.is_float_dtype(ids.dtype):
+        whole = ids.notna() & (ids % 1 == 0)
+        ids = ids.astype(object).where(~whole, ids[whole].astype('int64'))
+    normalized = (
+        ids.astype('str')
+        .str.replace(r'\s+', '', regex=True)
+        .str.replace(r'^(\d+)\.0*$', r'\1', regex=True)
+        .str.replace(r'^0+(\d+)$', r'\1', regex=True)
+    )
+    return normalized.mask(normalized == '')
+
+class RecordIndex:
+    """
+    Hash index of the respondent IDs of a frame, built once in O(n): normalized ID ->
+    row positions. Answers duplicate reports and lookups by ID without rescanning.
+
+    Row positions are 0-based positions in the indexed frame (df.iloc), not labels.
+
+    Attributes:
+        ids: The raw IDs as text.
+        keys: The normalized IDs (NaN for blank ones).
+    """
+
+    def __init__(self, ids):
+        ids = ids if isinstance(ids, pd.Series) else pd.Series(list(ids), dtype=object)
+        self.ids = ids.astype('str').reset_index(drop=True)
+        self.keys = normalize_ids(ids).reset_index(drop=True)
+        # 1. Factorize normalized and raw IDs (hash tables, one pass each)
+        self._codes, self._uniques = pd.factorize(self.keys)
+        self._uniques = np.asarray(self._uniques, dtype=object)
+        self._raw_codes, self._raw_uniques = pd.factorize(self.ids)
+        self._raw_uniques = np.asarray(self._raw_uniques, dtype=object)
+        # 2. Group row positions by normalized ID (one stable sort of the integer codes):
+        #    the rows of ID i are _order[_offsets[i]:_offsets[i + 1]]; blanks (code -1) excluded
+        present = self._codes >= 0
+        rows = np.flatnonzero(present)
+        self._order = rows[np.argsort(self._codes[present], kind='stable')]
+        self._sizes = np.bincount(self._codes[present], minlength=len(self._uniques))
+        self._offsets = np.concatenate([[0], np.cumsum(self._sizes)])
+        self._lookup = {key: i for i, key in enumerate(self._uniques)}
+        self.missing = np.flatnonzero(~present)
+
+    @classmethod
+    def from_frame(cls, df, column=RECORD_ID_COLUMN):
+        """Indexes the RecordID column of a merged frame (or any other ID column)."""
+        if column not in df.columns:
+            raise ValueError(f"Column '{column}' not found; cannot index respondent IDs.")
+        return cls(df[column])
+
+    def __len__(self):
+        """Number of distinct (normalized) IDs."""
+        return len(self._uniques)
+
+    def __contains__(self, record_id):
+        return self._key(record_id) in self._lookup
+
+    def _key(self, record_id):
+        return normalize_ids([record_id]).iloc[0]
+
+    def positions(self, record_id):
+        """Row positions of an ID in any spelling ('1046', 1046, ' 01046'); empty if absent."""
+        i = self._lookup.get(self._key(record_id))
+        return self._rows(i) if i is not None else np.array([], dtype=np.intp)
+
+    def _rows(self, i):
+        return self._order[self._offsets[i]:self._offsets[i + 1]]
+
+    def lookup(self, record_ids):
+        """{record_id: row positions} for several IDs at once."""
+        return {record_id: self.positions(record_id) for record_id in record_ids}
+
+    @property
+    def counts(self):
+        """Rows per normalized ID."""
+        return pd.Series(self._sizes, index=pd.Index(self._uniques, name="RecordID"), name="rows")
+
+    def duplicate_groups(self):
+        """
+        IDs that occur on more than one row.
+
+        Returns:
+            pd.DataFrame: One row per duplicated ID with columns RecordID (normalized),
+            Spellings (the distinct raw IDs), Rows (row positions), Count and Match -
+            'exact' when every row has the identical raw ID, 'normalized' when the
+            rows only match after normalization (whitespace, leading zeros, 1046 vs '1046').
+        """
+        groups = np.flatnonzero(self._sizes > 1)
+        # Distinct (ID, raw spelling) pairs of the duplicated rows, sorted by ID then first appearance
+        rows = np.flatnonzero(self.duplicate_rows())
+        pairs = np.unique(self._codes[rows].astype(np.int64) * len(self._raw_uniques) + self._raw_codes[rows])
+        pair_groups, pair_raw = np.divmod(pairs, len(self._raw_uniques))
+        spellings = np.split(self._raw_uniques[pair_raw], np.flatnonzero(np.diff(pair_groups)) + 1) if len(pairs) else []
+        return pd.DataFrame({
+            "RecordID": pd.Series(self._uniques[groups], dtype='str'),
+            "Spellings": [list(group) for group in spellings],
+            "Rows": [self._rows(i).tolist() for i in groups],
+            "Count": self._sizes[groups],
+            "Match": ["exact" if len(group) == 1 else "normalized" for group in spellings],
+        }, columns=["RecordID", "Spellings", "Rows", "Count", "Match"])
+
+    def duplicate_rows(self, exact=False):
+        """
+        Boolean mask of rows whose ID occurs more than once.
+
+        Args:
+            exact: Compare the raw IDs as written (like df.duplicated(keep=False))
+                instead of the normalized ones.
+        """
+        codes = self._raw_codes if exact else self._codes
+        counts = np.bincount(codes[codes >= 0], minlength=codes.max() + 1 if len(codes) else 0)
+        mask = np.zeros(len(codes), dtype=bool)
+        mask[codes >= 0] = counts[codes[codes >= 0]] > 1
+        if exact:
+            mask[self.missing] = False
+        return mask
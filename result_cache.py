@@ -0,0 +1,253 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import pandas as pd
+import pyarrow as pa
+from codebook import Codebook
+from pipeline import DatasetResult
+from processing import write_merged_feather
+
+# Bump when the merged layout or Codebook changes, so old entries are never served
+CACHE_VERSION = 3
+DEFAULT_CACHE_DIR = os.environ.get("DATA_UNION_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "data_union"))
+DEFAULT_MAX_BYTES = int(float(os.environ.get("DATA_UNION_CACHE_MB", 2048)) * 1024 * 1024)
+
+FRAME_FILE = "merged.arrow"
+CODEBOOK_FILE = "codebook.json"
+META_FILE = "meta.json"
+ARTIFACT_DIR = "artifacts"
+
+def _read_bytes(file):
+    if isinstance(file, (bytes, bytearray, memoryview)):
+        return bytes(file)
+    if hasattr(file, 'getvalue'):
+        return file.getvalue()
+    if hasattr(file, 'read'):
+        file.seek(0)
+        data = file.read()
+        file.seek(0)
+        return data
+    with open(file, 'rb') as f:
+        return f.read()
+
+def cache_key(values_file, labels_file, **settings):
+    """
+    Content address of a merge: SHA-256 over the values file, the labels file and the
+    settings that change the result (e.g. name='pre', unique_id_col='Q22').
+
+    Args:
+        values_file / labels_file: Paths, bytes or file-like objects (uploads).
+        settings: Keyword settings; their order does not matter.
+
+    Returns:
+        str: Hex digest.
+    """
+    digest = hashlib.sha256(f"data_union-{CACHE_VERSION}".encode())
+    for file in (values_file, labels_file):
+        content = _read_bytes(file)
+        # Length prefix so the two files cannot be shifted into each other
+        digest.update(len(content).to_bytes(8, 'little'))
+        digest.update(content)
+    digest.update(json.dumps(settings, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for file_name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, file_name))
+            except OSError:
+                pass
+    return total
+
+def _write_atomic(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+class ResultCache:
+    """
+    Content-addressed on-disk cache of merged datasets and their exports, shared by
+    every session (and process) that points at the same directory.
+
+    Each entry is a folder named after its cache_key holding the merged frame as an
+    uncompressed Arrow IPC file (memory-mapped on load), the Codebook as JSON and one
+    file per generated export. Nothing in the folder is executed on load (no pickle),
+    so a cache directory writable by other users can at worst serve wrong data, not
+    run code; still, point it at a directory only trusted users can write to. Entries
+    are evicted least recently used first once the folder grows past max_bytes; using
+    an entry refreshes its modification time.
+
+    Attributes:
+        directory: Cache folder.
+        max_bytes: Size cap of all entries together.
+        hits / misses / evictions: Counters since this object was created.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # (entries, bytes) as of the last store/evict; None until first needed
+        self._usage = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, *parts):
+        return os.path.join(self.directory, key, *parts)
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key, META_FILE))
+
+    def load(self, key):
+        """
+        Returns the cached DatasetResult for key (with every stored export), or None.
+
+        The Arrow file is read from a memory map and every column is wrapped as a
+        pd.ArrowDtype column over the mapped buffers, so loading copies no data: Value
+        columns come back as int64[pyarrow] and Label columns as dictionary-encoded
+        strings, which the exports, explorer and linkage handle like the Int64 and
+        Categorical columns of a fresh merge.
+        """
+        if key not in self:
+            self.misses += 1
+            return None
+        try:
+            with open(self._path(key, META_FILE), encoding='utf-8') as f:
+                meta = json.load(f)
+            # The buffers keep the mapping alive after the file is closed
+            with pa.memory_map(self._path(key, FRAME_FILE)) as source:
+                df = pa.ipc.open_file(source).read_all().to_pandas(types_mapper=pd.ArrowDtype)
+            with open(self._path(key, CODEBOOK_FILE), encoding='utf-8') as f:
+                codebook = json.load(f)
+            codebook = Codebook.from_dict(codebook) if codebook is not None else None
+            artifacts = {}
+            artifact_dir = self._path(key, ARTIFACT_DIR)
+            for kind in os.listdir(artifact_dir):
+                if not kind.startswith('.tmp-'):
+                    with open(os.path.join(artifact_dir, kind), 'rb') as f:
+                        artifacts[kind] = f.read()
+        except (OSError, ValueError, KeyError, TypeError, pa.ArrowException) as e:
+            # Half-written or damaged entry (e.g. evicted by another process): rebuild it
+            print(f"WARNING: Discarding unreadable cache entry {key[:12]}: {e}")
+            self.discard(key)
+            self.misses += 1
+            return None
+        self._touch(key)
+        self.hits += 1
+        return DatasetResult(meta['name'], meta['title'], df=df, codebook=codebook,
+                             artifacts=artifacts, cache_key=key)
+
+    def store(self, key, result):
+        """
+        Saves a merged result under key: the frame and Codebook the first time, then
+        any export not stored yet, so calling it again after more exports is cheap.
+        Failed merges are not stored.
+        """
+        if not result.ok:
+            return
+        result.cache_key = key
+        if key not in self:
+            os.makedirs(self.directory, exist_ok=True)
+            staging = tempfile.mkdtemp(dir=self.directory, prefix=".tmp-")
+            try:
+                # Uncompressed, so the file can be memory-mapped without decoding
+                write_merged_feather(result.df, os.path.join(staging, FRAME_FILE), compression=None)
+                with open(os.path.join(staging, CODEBOOK_FILE), 'w', encoding='utf-8') as f:
+                    # NumPy scalars (pairs from a scanned frame) are written as plain numbers
+                    json.dump(result.codebook.to_dict() if result.codebook is not None else None,
+                              f, default=lambda value: value.item())
+                os.makedirs(os.path.join(staging, ARTIFACT_DIR))
+                with open(os.path.join(staging, META_FILE), 'w', encoding='utf-8') as f:
+                    json.dump({
+                        'name': result.name,
+                        'title': result.title,
+                        'created': time.time(),
+                    }, f)
+                os.replace(staging, self._path(key))
+            except OSError:
+                # Another process stored the same key first; theirs is identical
+                shutil.rmtree(staging, ignore_errors=True)
+                if key not in self:
+                    raise
+        for kind, data in result.artifacts.items():
+            path = self._path(key, ARTIFACT_DIR, kind)
+            if not os.path.exists(path):
+                _write_atomic(path, data)
+        self._touch(key)
+        self.evict(keep=key)
+
+    def discard(self, key):
+        shutil.rmtree(self._path(key), ignore_errors=True)
+        self._usage = None
+
+    def _touch(self, key):
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+
+    def entries(self):
+        """[(key, size in bytes, last used)] of the stored entries, least recently used first."""
+        entries = []
+        for key in os.listdir(self.directory):
+            path = self._path(key)
+            if key.startswith('.tmp-') or not os.path.isdir(path):
+                continue
+            try:
+                entries.append((key, _dir_size(path), os.path.getmtime(path)))
+            except OSError:
+                continue
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def evict(self, keep=None):
+        """Removes least recently used entries until the cache fits in max_bytes."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        for key, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self.discard(key)
+            self.evictions += 1
+            total -= size
+            count -= 1
+        self._usage = (count, total)
+
+    def clear(self):
+        for key, _, _ in self.entries():
+            self.discard(key)
+        self._usage = (0, 0)
+
+    def stats(self):
+        """
+        Hit/miss/eviction counters and the size of the cache. The size is the one counted
+        by the last store (or the first call), so this does not walk the folder each time;
+        entries written by other processes since then show up after the next store.
+        """
+        if self._usage is None:
+            entries = self.entries()
+            self._usage = (len(entries), sum(size for _, size, _ in entries))
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': self._usage[0],
+            'bytes': self._usage[1],
+            'max_bytes': self.max_bytes,
+        }
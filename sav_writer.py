@@ -0,0 +1,371 @@
+import datetime
+import io
+import re
+import struct
+import numpy as np
+import pandas as pd
+
+# Cells encoded per batch; bounds the writer's working memory however wide the file is
+SAV_CHUNK_CELLS = 500000
+
+# Bytecode compression: small integers are stored as a single command byte (value + bias)
+SAV_BIAS = 100
+_CODE_PADDING = 0
+_CODE_RAW = 253
+_CODE_SPACES = 254
+_CODE_SYSMIS = 255
+
+SYSMIS = -np.finfo(np.float64).max
+MAX_STRING_WIDTH = 32767
+# Wider strings are "very long strings": split into variables of up to 255 bytes, each
+# segment starting 252 bytes of declared width after the previous one
+SHORT_STRING_WIDTH = 255
+_SEGMENT_STEP = 252
+MAX_VARIABLE_LABEL = 255
+MAX_VALUE_LABEL = 120
+
+_RESERVED_NAMES = {'ALL', 'AND', 'BY', 'EQ', 'GE', 'GT', 'LE', 'LT', 'NE', 'NOT', 'OR', 'TO', 'WITH'}
+_MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+# Print/write format codes (type << 16 | width << 8 | decimals)
+_FORMAT_A = 1
+_FORMAT_F = 5
+
+# Measurement levels for the variable display record
+_NOMINAL = 1
+_SCALE = 3
+
+def _fit(text, size):
+    """UTF-8 bytes of text cut to at most size bytes without splitting a character."""
+    raw = str(text).encode('utf-8')
+    if len(raw) > size:
+        raw = raw[:size].decode('utf-8', errors='ignore').encode('utf-8')
+    return raw
+
+def _padded(text, size):
+    """text as UTF-8, cut or space-padded to exactly size bytes."""
+    return _fit(text, size).ljust(size, b' ')
+
+def _variable_names(columns):
+    """
+    SPSS-safe variable names for the columns, plus the unique 8-byte short names the
+    dictionary records need. Names are case-insensitive in SPSS, so uniqueness is too.
+
+    Returns:
+        list: (long_name, short_name) per column.
+    """
+    names = []
+    used_long, used_short = set(), set()
+    for i, col in enumerate(columns):
+        name = re.sub(r'[^\w.@#$]+', '_', str(col)).rstrip('._')
+        if not re.match(r'[^\W\d_]|@', name):
+            name = f"V{name}"
+        name = _fit(name, 60).decode('utf-8')
+        if name.upper() in _RESERVED_NAMES:
+            name = f"{name}_"
+        base, n = name, 1
+        while name.upper() in used_long:
+            n += 1
+            name = f"{base}_{n}"
+        used_long.add(name.upper())
+
+        short = name.upper() if name.isascii() and len(name) <= 8 else ''
+        if not short or short in used_short:
+            short = f"V{i + 1}"
+            while short in used_short:
+                short = f"{short}_"[:8]
+        used_short.add(short)
+        names.append((name, short))
+    return names
+
+class _Variable:
+    """
+    Dictionary layout of one column: its names, type and 8-byte segments. A string
+    wider than SHORT_STRING_WIDTH is stored as several string variables (segment_widths),
+    each after the first with its own short name in segment_names.
+    """
+
+    def __init__(self, column, name, short_name, width, integral):
+        self.column = column
+        self.name = name
+        self.short_name = short_name
+        self.width = width  # 0 for numeric, bytes for strings
+        self.integral = integral
+        if width <= SHORT_STRING_WIDTH:
+            self.segment_widths = [width]
+        else:
+            n = -(-width // _SEGMENT_STEP)
+            self.segment_widths = [SHORT_STRING_WIDTH] * (n - 1) + [width - _SEGMENT_STEP * (n - 1)]
+        self.segment_names = [short_name]
+        self.segments = 1 if width == 0 else sum(-(-w // 8) for w in self.segment_widths)
+
+def _segment_names(variables):
+    """Unique 8-byte short names for the extra segments of very long strings (TEXT -> TEXT1, TEXT2, ...)."""
+    used = {v.short_name for v in variables}
+    for variable in variables:
+        for k in range(1, len(variable.segment_widths)):
+            suffix = str(k)
+            name = variable.short_name[:8 - len(suffix)] + suffix
+            n = 0
+            while name in used:
+                n += 1
+                name = f"S{n}_{suffix}"[:8]
+            used.add(name)
+            variable.segment_names.append(name)
+
+def _layout(chunk, string_widths):
+    """Builds the variable list from the first chunk's columns and dtypes."""
+    variables = []
+    names = _variable_names(chunk.columns)
+    for (column, col), (name, short_name) in zip(chunk.items(), names):
+        if pd.api.types.is_bool_dtype(col) or pd.api.types.is_numeric_dtype(col):
+            integral = pd.api.types.is_bool_dtype(col) or pd.api.types.is_integer_dtype(col)
+            variables.append(_Variable(column, name, short_name, 0, integral))
+            continue
+        width = string_widths.get(column) if string_widths else None
+        if width is None:
+            lengths = col.dropna().astype(str).str.encode('utf-8').str.len()
+            width = int(lengths.max()) if len(lengths) else 1
+        width = min(max(width, 1), MAX_STRING_WIDTH)
+        variables.append(_Variable(column, name, short_name, width, False))
+    _segment_names(variables)
+    return variables
+
+def _header_record(n_segments, n_cases, file_label):
+    now = datetime.datetime.now()
+    return b''.join([
+        b'$FL2',
+        _padded('@(#) SPSS DATA FILE - Qualtrics Data Merger', 60),
+        struct.pack('<iiiii', 2, n_segments, 1, 0, n_cases),
+        struct.pack('<d', SAV_BIAS),
+        f"{now.day:02d} {_MONTHS[now.month - 1]} {now.year % 100:02d}".encode('ascii'),
+        now.strftime('%H:%M:%S').encode('ascii'),
+        _padded(file_label, 64),
+        b'\x00' * 3,
+    ])
+
+def _variable_records(variable, label):
+    parts = []
+    # One variable per segment; only the first carries the label
+    for k, (width, short_name) in enumerate(zip(variable.segment_widths, variable.segment_names)):
+        if width == 0:
+            fmt = (_FORMAT_F << 16) | (8 << 8) | (0 if variable.integral else 2)
+        else:
+            fmt = (_FORMAT_A << 16) | (width << 8)
+        has_label = k == 0 and label is not None
+        parts += [struct.pack('<iiiiii', 2, width, int(has_label), 0, fmt, fmt), _padded(short_name, 8)]
+        if has_label:
+            raw = _fit(label, MAX_VARIABLE_LABEL)
+            parts.append(struct.pack('<i', len(raw)) + raw.ljust(-(-len(raw) // 4) * 4, b' '))
+        # Strings longer than 8 bytes take one continuation record per extra 8 bytes
+        for _ in range(-(-width // 8) - 1):
+            parts.append(struct.pack('<iiiiii', 2, -1, 0, 0, 0, 0) + b' ' * 8)
+    return b''.join(parts)
+
+def _value_label_records(labels, index):
+    """Type 3 record with the value labels, followed by the type 4 record naming the variable."""
+    parts = [struct.pack('<ii', 3, len(labels))]
+    for value, label in labels.items():
+        raw = _fit(label, MAX_VALUE_LABEL)
+        entry = bytes([len(raw)]) + raw
+        parts.append(struct.pack('<d', float(value)) + entry.ljust(-(-len(entry) // 8) * 8, b' '))
+    parts.append(struct.pack('<iii', 4, 1, index))
+    return b''.join(parts)
+
+def _info_record(subtype, size, payload):
+    return struct.pack('<iiii', 7, subtype, size, len(payload) // size) + payload
+
+def _dictionary(variables, n_cases, file_label, variable_labels, value_labels):
+    """Everything before the case data: header, variables, labels and extension records."""
+    n_segments = sum(v.segments for v in variables)
+    parts = [_header_record(n_segments, n_cases, file_label)]
+    for variable in variables:
+        parts.append(_variable_records(variable, variable_labels.get(variable.column)))
+
+    index = 1
+    for variable in variables:
+        labels = value_labels.get(variable.column)
+        # Only numeric variables carry value labels here
+        if labels and variable.width == 0:
+            parts.append(_value_label_records(labels, index))
+        index += variable.segments
+
+    # Machine integer info: version, machine code, IEEE floats, compression, little-endian, UTF-8
+    parts.append(_info_record(3, 4, struct.pack('<8i', 20, 0, 0, -1, 1, 1, 2, 65001)))
+    lowest = float.fromhex('-0x1.ffffffffffffep+1023')
+    parts.append(_info_record(4, 8, struct.pack('<3d', SYSMIS, -SYSMIS, lowest)))
+    display = []
+    for variable in variables:
+        if variable.width:
+            display += [(_NOMINAL, min(variable.width, 40), 0)] * len(variable.segment_widths)
+        else:
+            display.append((_NOMINAL if value_labels.get(variable.column) else _SCALE, 8, 1))
+    parts.append(_info_record(11, 4, b''.join(struct.pack('<3i', *d) for d in display)))
+    long_names = '\t'.join(f"{v.short_name}={v.name}" for v in variables).encode('utf-8')
+    parts.append(_info_record(13, 1, long_names))
+    very_long = ''.join(f"{v.short_name}={v.width:05d}\0\t" for v in variables if len(v.segment_widths) > 1)
+    if very_long:
+        parts.append(_info_record(14, 1, very_long.encode('utf-8')))
+    parts.append(_info_record(20, 1, b'UTF-8'))
+    parts.append(struct.pack('<ii', 999, 0))
+    return b''.join(parts)
+
+def _encode_cases(part, variables):
+    """
+    Bytecode commands and raw 8-byte payloads for a batch of cases, in file order.
+
+    Returns:
+        tuple: (codes, payloads, truncated) - a flat uint8 array of commands, an (n, 8)
+        uint8 array holding the data for each _CODE_RAW command, and the number of
+        string values cut to fit their variable's width.
+    """
+    n_rows = len(part)
+    n_segments = sum(v.segments for v in variables)
+    codes = np.empty((n_rows, n_segments), dtype=np.uint8)
+    data = np.empty((n_rows, n_segments, 8), dtype=np.uint8)
+    truncated = 0
+
+    pos = 0
+    for variable in variables:
+        col = part[variable.column]
+        if variable.width == 0:
+            numbers = col.to_numpy(dtype='float64', na_value=np.nan)
+            compact = (numbers == np.round(numbers)) & (numbers >= 1 - SAV_BIAS) & (numbers <= 251 - SAV_BIAS)
+            column_codes = np.full(n_rows, _CODE_RAW, dtype=np.uint8)
+            column_codes[compact] = (numbers[compact] + SAV_BIAS).astype(np.uint8)
+            column_codes[np.isnan(numbers)] = _CODE_SYSMIS
+            codes[:, pos] = column_codes
+            data[:, pos] = numbers.view(np.uint8).reshape(n_rows, 8)
+        else:
+            raw = [str(value).encode('utf-8') for value in col.to_numpy(dtype=object, na_value='')]
+            truncated += sum(len(value) > variable.width for value in raw)
+            # Too-long values are cut to the declared width (not the padded segment size),
+            # on a character boundary, then padded like the rest
+            cells = b''.join(_string_cell(_fit(value.decode('utf-8'), variable.width) if len(value) > variable.width else value,
+                                          variable) for value in raw)
+            segments = np.frombuffer(cells, dtype=np.uint8).reshape(n_rows, variable.segments, 8)
+            blank = (segments == ord(' ')).all(axis=2)
+            codes[:, pos:pos + variable.segments] = np.where(blank, _CODE_SPACES, _CODE_RAW)
+            data[:, pos:pos + variable.segments] = segments
+        pos += variable.segments
+
+    codes = codes.ravel()
+    payloads = data.reshape(-1, 8)[codes == _CODE_RAW]
+    return codes, payloads, truncated
+
+def _string_cell(value, variable):
+    """A string value laid out over its variable's segments: 255 bytes each, space-padded to 8-byte units."""
+    if len(variable.segment_widths) == 1:
+        return value.ljust(variable.segments * 8, b' ')
+    return b''.join(value[k * SHORT_STRING_WIDTH:(k + 1) * SHORT_STRING_WIDTH].ljust(-(-width // 8) * 8, b' ')
+                    for k, width in enumerate(variable.segment_widths))
+
+def _compress_blocks(codes, payloads):
+    """
+    Lays out complete 8-command blocks: each block's command bytes followed by the
+    payloads of its _CODE_RAW commands, all placed with index arithmetic.
+
+    Args:
+        codes: Flat command array whose length is a multiple of 8.
+        payloads: (n, 8) payloads, one per _CODE_RAW command, in order.
+
+    Returns:
+        bytes: The compressed data.
+    """
+    blocks = codes.reshape(-1, 8)
+    per_block = (blocks == _CODE_RAW).sum(axis=1)
+    sizes = 8 + 8 * per_block
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    out = np.empty(int(sizes.sum()), dtype=np.uint8)
+    out[starts[:, None] + np.arange(8)] = blocks
+
+    owner = np.repeat(np.arange(len(blocks)), per_block)
+    first = np.concatenate([[0], np.cumsum(per_block)[:-1]])
+    rank = np.arange(len(payloads)) - first[owner]
+    out[(starts[owner] + 8 + 8 * rank)[:, None] + np.arange(8)] = payloads
+    return out.tobytes()
+
+def write_sav(data, output=None, variable_labels=None, value_labels=None, file_label='',
+              string_widths=None, chunksize=None):
+    """
+    Writes a DataFrame as a bytecode-compressed SPSS .sav file, encoding the cases in
+    row batches so memory stays flat however many rows are written.
+
+    Numeric and nullable integer columns become numeric variables (missing values are
+    system-missing); everything else becomes a string variable as wide as its longest
+    value (at most 32767 bytes; values over 255 bytes, such as long free-text answers,
+    are written as SPSS very long strings). Column names are made SPSS-safe where needed.
+
+    Args:
+        data: DataFrame, or an iterable of DataFrames sharing the same columns.
+        output: Path or binary file-like object to write to. A new BytesIO is used if omitted.
+        variable_labels: Optional {column: label} map (e.g. the question text).
+        value_labels: Optional {column: {value: label}} map for numeric columns.
+        file_label: Optional file label shown by SPSS.
+        string_widths: Optional {column: bytes} widths. When data is an iterable, string
+            widths otherwise come from the first chunk and longer values are cut.
+        chunksize: Rows encoded at a time. Defaults to about SAV_CHUNK_CELLS cells' worth.
+
+    Returns:
+        The output the file was written to (the BytesIO when none was given).
+    """
+    variable_labels = variable_labels or {}
+    value_labels = value_labels or {}
+    is_frame = isinstance(data, pd.DataFrame)
+    chunks = iter([data] if is_frame else data)
+    first = next(chunks, None)
+    if first is None:
+        raise ValueError("No data to write.")
+
+    if output is None:
+        output = io.BytesIO()
+    stream = open(output, 'wb') if isinstance(output, str) else output
+    try:
+        variables = _layout(first, string_widths)
+        n_cases = len(first) if is_frame else -1
+        case_count_at = stream.tell() + 80 if stream.seekable() else None
+        stream.write(_dictionary(variables, n_cases, file_label, variable_labels, value_labels))
+
+        n_segments = sum(v.segments for v in variables)
+        step = chunksize or max(1, SAV_CHUNK_CELLS // max(1, n_segments))
+        pending_codes = np.empty(0, dtype=np.uint8)
+        pending_payloads = np.empty((0, 8), dtype=np.uint8)
+        rows = truncated = 0
+        for chunk in ([first] if is_frame else _chain(first, chunks)):
+            for start in range(0, len(chunk), step):
+                part = chunk.iloc[start:start + step]
+                codes, payloads, cut = _encode_cases(part, variables)
+                truncated += cut
+                rows += len(part)
+
+                # Commands run on across cases; hold back the last partial block
+                codes = np.concatenate([pending_codes, codes])
+                payloads = np.concatenate([pending_payloads, payloads])
+                full = len(codes) // 8 * 8
+                n_full_payloads = int((codes[:full] == _CODE_RAW).sum())
+                if full:
+                    stream.write(_compress_blocks(codes[:full], payloads[:n_full_payloads]))
+                pending_codes, pending_payloads = codes[full:], payloads[n_full_payloads:]
+
+        if len(pending_codes):
+            padding = np.full(8 - len(pending_codes), _CODE_PADDING, dtype=np.uint8)
+            stream.write(_compress_blocks(np.concatenate([pending_codes, padding]), pending_payloads))
+
+        if n_cases == -1 and case_count_at is not None:
+            end = stream.tell()
+            stream.seek(case_count_at)
+            stream.write(struct.pack('<i', rows))
+            stream.seek(end)
+    finally:
+        if stream is not output:
+            stream.close()
+
+    if truncated:
+        print(f"WARNING: {truncated} text values were longer than their SPSS variable width and were cut.")
+    if hasattr(output, 'seek'):
+        output.seek(0)
+    return output
+
+def _chain(first, rest):
+    yield first
+    yield from rest
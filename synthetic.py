@@ -0,0 +1,176 @@
+import argparse
+import os
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+
+# The 17 built-in columns Qualtrics puts before the questions: (QID row, text row, ImportId)
+METADATA_COLUMNS = [
+    ("StartDate", "Start Date", "startDate"),
+    ("EndDate", "End Date", "endDate"),
+    ("Status", "Response Type", "status"),
+    ("IPAddress", "IP Address", "ipAddress"),
+    ("Progress", "Progress", "progress"),
+    ("Duration (in seconds)", "Duration (in seconds)", "duration"),
+    ("Finished", "Finished", "finished"),
+    ("RecordedDate", "Recorded Date", "recordedDate"),
+    ("ResponseId", "Response ID", "_recordId"),
+    ("RecipientLastName", "Recipient Last Name", "recipientLastName"),
+    ("RecipientFirstName", "Recipient First Name", "recipientFirstName"),
+    ("RecipientEmail", "Recipient Email", "recipientEmail"),
+    ("ExternalReference", "External Data Reference", "externalDataReference"),
+    ("LocationLatitude", "Location Latitude", "locationLatitude"),
+    ("LocationLongitude", "Location Longitude", "locationLongitude"),
+    ("DistributionChannel", "Distribution Channel", "distributionChannel"),
+    ("UserLanguage", "User Language", "userLanguage"),
+]
+
+AGREEMENT = ["Strongly disagree", "Somewhat disagree", "Neither agree nor disagree", "Somewhat agree", "Strongly agree"]
+FREQUENCY = ["Never", "Rarely", "Sometimes", "Often", "Always"]
+YES_NO = ["Yes", "No"]
+SCALES = [AGREEMENT, FREQUENCY, YES_NO]
+OPTIONS = ["Email", "Phone", "Text message", "Mail", "In person", "Social media", "Website", "Other"]
+WORDS = np.array("the survey was very helpful and clear but some questions were long or confusing for me".split(), dtype=object)
+
+@dataclass
+class SyntheticExport:
+    """
+    A generated values/labels export pair.
+
+    Attributes:
+        values_path / labels_path: The 'Numeric Values' and 'Choice Text' CSVs.
+        unique_id_col: QID of the respondent ID question (for process_survey_data).
+        rows: Number of responses.
+        columns: Number of CSV columns (metadata included).
+    """
+    values_path: str
+    labels_path: str
+    unique_id_col: str
+    rows: int
+    columns: int
+
+def _question_layout(n_questions, matrix_blocks, matrix_items, multi_select, free_text):
+    """
+    Column specs after the ID question: (qid, text, import_id, kind, scale). Single-choice
+    questions cycle through SCALES; matrix blocks are Qn_1..Qn_k sharing one scale;
+    multi-select questions get one column per option (split multi-value fields).
+    """
+    layout = []
+    qid = 2
+    for i in range(n_questions):
+        scale = SCALES[i % len(SCALES)]
+        layout.append((f"Q{qid}", f"Question {qid}: how do you feel about statement {i + 1}?", f"QID{qid}", "choice", scale))
+        qid += 1
+    for _ in range(matrix_blocks):
+        for item in range(1, matrix_items + 1):
+            layout.append((f"Q{qid}_{item}", f"Please rate the following. - Statement {item}", f"QID{qid}_{item}", "choice", AGREEMENT))
+        qid += 1
+    for _ in range(multi_select):
+        for option, text in enumerate(OPTIONS, start=1):
+            layout.append((f"Q{qid}_{option}", f"How do you prefer to be contacted? (Select all that apply) - Selected Choice - {text}",
+                           f"QID{qid}_{option}", "multi", [text]))
+        qid += 1
+    for _ in range(free_text):
+        layout.append((f"Q{qid}", "Is there anything else you would like to tell us?", f"QID{qid}_TEXT", "text", None))
+        qid += 1
+    return layout
+
+def write_qualtrics_exports(directory, rows=1000, questions=50, matrix_blocks=2, matrix_items=5,
+                            multi_select=1, free_text=1, missing_rate=0.05, seed=0):
+    """
+    Writes a synthetic values/labels export pair in the Qualtrics CSV format: 3 header
+    rows (QID, question text, ImportId JSON), the 17 metadata columns, a text-entry
+    respondent ID question (Q1) and then the questions.
+
+    Args:
+        directory: Folder for values.csv and labels.csv.
+        rows: Number of responses.
+        questions: Single-choice questions (agreement, frequency and yes/no scales).
+        matrix_blocks / matrix_items: Matrix questions and statements per matrix (Qn_1, Qn_2, ...).
+        multi_select: Select-all-that-apply questions, one column per option.
+        free_text: Free-text (_TEXT) questions.
+        missing_rate: Share of skipped answers (blank in both files).
+        seed: Random seed; the same arguments always give the same files.
+
+    Returns:
+        SyntheticExport: Paths and shape of the generated pair.
+    """
+    rng = np.random.default_rng(seed)
+    layout = _question_layout(questions, matrix_blocks, matrix_items, multi_select, free_text)
+    n_cols = len(METADATA_COLUMNS) + 1 + len(layout)
+
+    # 1. Metadata block and respondent ID, identical in both files
+    response_ids = np.array([f"R_{n:015x}" for n in rng.choice(16**15, size=rows, replace=False)], dtype=object)
+    start = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 90 * 86400, rows), unit="s")
+    duration = rng.integers(60, 3600, rows)
+    end = start + pd.to_timedelta(duration, unit="s")
+    metadata = [
+        start.strftime("%Y-%m-%d %H:%M:%S"), end.strftime("%Y-%m-%d %H:%M:%S"), np.zeros(rows, dtype=int),
+        np.full(rows, "10.0.0.1", dtype=object), np.full(rows, 100), duration, np.ones(rows, dtype=int),
+        end.strftime("%Y-%m-%d %H:%M:%S"), response_ids, *[np.full(rows, "", dtype=object)] * 4,
+        np.round(rng.uniform(25, 49, rows), 4), np.round(rng.uniform(-124, -67, rows), 4),
+        np.full(rows, "anonymous", dtype=object), np.full(rows, "EN", dtype=object),
+    ]
+    record_ids = np.char.zfill(rng.permutation(rows).astype(str), max(4, len(str(rows)))).astype(object)
+
+    values = [np.asarray(col, dtype=object) for col in metadata] + [record_ids]
+    labels = list(values)
+
+    # 2. Answers, column by column
+    for _, _, _, kind, scale in layout:
+        skipped = rng.random(rows) < missing_rate
+        if kind == "choice":
+            codes = rng.integers(0, len(scale), rows)
+            value = (codes + 1).astype(object)
+            label = np.asarray(scale, dtype=object)[codes]
+        elif kind == "multi":
+            chosen = rng.random(rows) < 0.3
+            value = np.where(chosen, 1, None).astype(object)
+            label = np.where(chosen, scale[0], None).astype(object)
+        else:
+            lengths = rng.integers(3, 15, rows)
+            words = rng.integers(0, len(WORDS), (rows, 15))
+            value = np.array([" ".join(WORDS[words[i, :n]]).capitalize() + "." for i, n in enumerate(lengths)], dtype=object)
+            label = value
+        value, label = value.copy(), label.copy()
+        value[skipped] = None
+        label[skipped] = None
+        values.append(value)
+        labels.append(label)
+
+    # 3. Header rows + data, written as CSV
+    qids = [m[0] for m in METADATA_COLUMNS] + ["Q1"] + [spec[0] for spec in layout]
+    texts = [m[1] for m in METADATA_COLUMNS] + ["Please enter your anonymous ID number."] + [spec[1] for spec in layout]
+    import_ids = [m[2] for m in METADATA_COLUMNS] + ["QID1_TEXT"] + [spec[2] for spec in layout]
+    header = pd.DataFrame([qids, texts, ['{"ImportId":"%s"}' % i for i in import_ids]])
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for name, columns in (("values.csv", values), ("labels.csv", labels)):
+        path = os.path.join(directory, name)
+        header.to_csv(path, header=False, index=False)
+        pd.DataFrame(dict(enumerate(columns))).to_csv(path, mode='a', header=False, index=False)
+        paths.append(path)
+    return SyntheticExport(paths[0], paths[1], "Q1", rows, n_cols)
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic Qualtrics values/labels export pair.")
+    parser.add_argument("directory", help="Output folder (values.csv, labels.csv).")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--questions", type=int, default=50, help="Single-choice questions.")
+    parser.add_argument("--matrix-blocks", type=int, default=2)
+    parser.add_argument("--matrix-items", type=int, default=5)
+    parser.add_argument("--multi-select", type=int, default=1)
+    parser.add_argument("--free-text", type=int, default=1)
+    parser.add_argument("--missing-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    export = write_qualtrics_exports(
+        args.directory, args.rows, args.questions, args.matrix_blocks, args.matrix_items,
+        args.multi_select, args.free_text, args.missing_rate, args.seed,
+    )
+    print(f"Wrote {export.rows} rows x {export.columns} columns to {export.values_path} and {export.labels_path} "
+          f"(unique ID column {export.unique_id_col}).")
+
+if __name__ == "__main__":
+    main()
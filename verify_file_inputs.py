@@ -0,0 +1,50 @@
+import io
+import tempfile
+from processing import process_survey_data, verify_alignment
+from synthetic import write_qualtrics_exports
+
+def verify_file_inputs():
+    """
+    Checks that every kind of input process_survey_data accepts gives the same merge:
+    paths, binary streams, text streams (io.StringIO) and files opened in text mode.
+    """
+    print("--- Verifying path, binary and text inputs ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        export = write_qualtrics_exports(tmp, rows=200, questions=10)
+        paths = (export.values_path, export.labels_path)
+        expected = process_survey_data(*paths, 'pre', export.unique_id_col)
+
+        def read(path, mode):
+            with open(path, mode) as f:
+                return f.read()
+
+        inputs = {
+            'binary stream': [io.BytesIO(read(path, 'rb')) for path in paths],
+            'text stream': [io.StringIO(read(path, 'r')) for path in paths],
+            'text-mode file': [open(path, 'r', encoding='utf-8') for path in paths],
+        }
+        failed = False
+        for name, files in inputs.items():
+            for engine in ('auto', 'pandas'):
+                for f in files:
+                    f.seek(0)
+                try:
+                    merged = process_survey_data(*files, 'pre', export.unique_id_col, engine=engine)
+                    for f in files:
+                        f.seek(0)
+                    verify_alignment(*files)
+                except Exception as e:
+                    print(f"FAILED: {name}, engine='{engine}': {e}")
+                    failed = True
+                    continue
+                if merged.astype(str).equals(expected.astype(str)):
+                    print(f"OK: {name}, engine='{engine}'")
+                else:
+                    print(f"FAILED: {name}, engine='{engine}' merged differently than the paths.")
+                    failed = True
+        for f in inputs['text-mode file']:
+            f.close()
+    print("SUCCESS" if not failed else "FAILURES ABOVE")
+
+if __name__ == "__main__":
+    verify_file_inputs()
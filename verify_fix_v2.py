@@ -18,24 +18,13 @@ def verify_robust():
     print(f"Values shape: {df_val.shape} (Cols: {ncols})")
     
     # Create header rows for labels
-    # Row 0: QIDs (Q1, Q2... QIndex)
-    # Row 1: Texts
-    qids = ["Meta"] * 17 + [f"Q{i}" for i in range(ncols-17)]
-    # Ensure Q22 is NOT explicitly used to prove index logic works
-    # Wait, col 17 (0-based) IS the 18th column.
-    # In my logic, I force the 1st iteration of loop (which is index 0 of the sliced list) to be RecordID.
-    # The slice is col 17 onwards.
-    # So if I make dummy labels, I just need enough columns.
-    
-    texts = ["MetaText"] * 17 + [f"Question Text {i}" for i in range(ncols-17)]
-    
-    # Dummy data rows (just 0s)
-    # processing.py reads df_labels then expects rows 0,1 for header and 3+ for data (which are ignored effectively for value merge?)
-    # Actually processing.py merges col_lab too. So we need data rows.
-    # We can just duplicate the header rows a few times to have valid length
+    # Row 0: QIDs and Row 1: Texts must match the values file; process_survey_data
+    # rejects a pair whose QIDs differ (exports of different surveys)
+    # The ResponseId column must match too, since the labels rows are paired by it
+    # Dummy labels: the values file itself (the merge only needs the same layout)
     
     # Create dataframe
-    df_lab = pd.DataFrame([qids, texts] + [texts] * (len(df_val)-2))
+    df_lab = df_val.copy()
     
     # Save to String IO is not supported by process_survey_data file path logic if it does .read_csv(path)
     # pass file object or path?
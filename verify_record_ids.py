@@ -0,0 +1,53 @@
+import tempfile
+import pandas as pd
+from processing import process_survey_data, stream_survey_data
+from synthetic import write_qualtrics_exports
+
+# IDs that are no int64: 20 digits (beyond 2**63), decimals and leading zeros
+ODD_IDS = ["12345678901234567890", "2.5", "00042", "99999999999999999999999", "-7.25", "ABC-1"]
+
+def verify_record_ids():
+    """
+    Checks that RecordIDs the numeric conversion cannot hold (20-digit numbers, decimals)
+    merge as text, unchanged, with every engine and in streaming mode.
+    """
+    print("--- Verifying large and non-integer RecordIDs ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        export = write_qualtrics_exports(tmp, rows=len(ODD_IDS) * 10, questions=5)
+
+        # 1. Replace the respondent ID column (Q1, right after the metadata) in both files
+        expected = [ODD_IDS[i % len(ODD_IDS)] + ("" if i < len(ODD_IDS) else f"{i}") for i in range(export.rows)]
+        for path in (export.values_path, export.labels_path):
+            raw = pd.read_csv(path, header=None, dtype=str, keep_default_na=False)
+            id_col = raw.iloc[0].tolist().index(export.unique_id_col)
+            raw.iloc[3:, id_col] = expected
+            raw.to_csv(path, header=False, index=False)
+
+        # 2. Merge them every way process_survey_data and stream_survey_data can
+        runs = {
+            f"engine='{engine}'": lambda engine=engine: process_survey_data(
+                export.values_path, export.labels_path, 'pre', export.unique_id_col, engine=engine)
+            for engine in ('auto', 'pandas')
+        }
+        runs['streaming'] = lambda: pd.concat(stream_survey_data(
+            export.values_path, export.labels_path, 'pre', export.unique_id_col, chunksize=7), ignore_index=True)
+
+        failed = False
+        for name, run in runs.items():
+            try:
+                merged = run()
+            except Exception as e:
+                print(f"FAILED: {name}: {type(e).__name__}: {e}")
+                failed = True
+                continue
+            ids = merged["RecordID (Value)"].tolist()
+            if ids == expected:
+                print(f"OK: {name} kept all {len(ids)} RecordIDs as text")
+            else:
+                bad = [(want, got) for want, got in zip(expected, ids) if want != got][:3]
+                print(f"FAILED: {name} changed RecordIDs, e.g. {bad}")
+                failed = True
+    print("SUCCESS" if not failed else "FAILURES ABOVE")
+
+if __name__ == "__main__":
+    verify_record_ids()